@@ -0,0 +1,101 @@
+"""
+Achievement catalog.
+
+Achievements are milestones on the same counters badges are awarded from
+(``users.stats`` and ``users.points``, see ``badges.py``). The catalog is
+static, so progress depends only on the user's counter values: responses
+are built once per distinct set of values and cached, and the values'
+digest doubles as the response's ETag.
+"""
+
+from functools import lru_cache
+import hashlib
+
+from badges import badge_values
+from streaks import STREAKS, current_streak
+
+ACHIEVEMENTS = (
+    # Point achievements
+    {'name': 'Getting Started', 'description': 'Earn your first 100 points', 'category': 'points', 'key': 'points', 'threshold': 100, 'icon': '🎯'},
+    {'name': 'Point Collector', 'description': 'Earn 500 points', 'category': 'points', 'key': 'points', 'threshold': 500, 'icon': '💎'},
+    {'name': 'Point Master', 'description': 'Earn 1,000 points', 'category': 'points', 'key': 'points', 'threshold': 1000, 'icon': '👑'},
+    {'name': 'Point Legend', 'description': 'Earn 5,000 points', 'category': 'points', 'key': 'points', 'threshold': 5000, 'icon': '🏆'},
+
+    # Reading achievements
+    {'name': 'First Book', 'description': 'Add your first book', 'category': 'reading', 'key': 'books_added', 'threshold': 1, 'icon': '📖'},
+    {'name': 'Bookworm', 'description': 'Add 10 books to your library', 'category': 'reading', 'key': 'books_added', 'threshold': 10, 'icon': '🐛'},
+    {'name': 'Book Collector', 'description': 'Add 25 books to your library', 'category': 'reading', 'key': 'books_added', 'threshold': 25, 'icon': '📚'},
+    {'name': 'Library Master', 'description': 'Add 50 books to your library', 'category': 'reading', 'key': 'books_added', 'threshold': 50, 'icon': '🏛️'},
+
+    # Completion achievements
+    {'name': 'First Finish', 'description': 'Finish your first book', 'category': 'completion', 'key': 'books_finished', 'threshold': 1, 'icon': '✅'},
+    {'name': 'Dedicated Reader', 'description': 'Finish 5 books', 'category': 'completion', 'key': 'books_finished', 'threshold': 5, 'icon': '🎓'},
+    {'name': 'Voracious Reader', 'description': 'Finish 25 books', 'category': 'completion', 'key': 'books_finished', 'threshold': 25, 'icon': '🦈'},
+
+    # Productivity achievements
+    {'name': 'First Task', 'description': 'Complete your first focus session', 'category': 'productivity', 'key': 'tasks_completed', 'threshold': 1, 'icon': '⏰'},
+    {'name': 'Task Master', 'description': 'Complete 50 focus sessions', 'category': 'productivity', 'key': 'tasks_completed', 'threshold': 50, 'icon': '💪'},
+    {'name': 'Focus Master', 'description': 'Complete 100 focus sessions', 'category': 'productivity', 'key': 'tasks_completed', 'threshold': 100, 'icon': '🧠'},
+
+    # Quote achievements
+    {'name': 'Quote Collector', 'description': 'Add 10 quotes', 'category': 'quotes', 'key': 'quotes_added', 'threshold': 10, 'icon': '💬'},
+    {'name': 'Wisdom Keeper', 'description': 'Add 50 quotes', 'category': 'quotes', 'key': 'quotes_added', 'threshold': 50, 'icon': '🔮'},
+
+    # Streak achievements
+    {'name': 'Reading Streak', 'description': 'Read for 7 consecutive days', 'category': 'streak', 'key': 'reading_streak', 'threshold': 7, 'icon': '🔥'},
+    {'name': 'Productivity Streak', 'description': 'Complete tasks for 7 consecutive days', 'category': 'streak', 'key': 'productivity_streak', 'threshold': 7, 'icon': '⚡'}
+)
+
+# Counters achievements are evaluated against, in response order
+STAT_KEYS = ('points', 'books_added', 'books_finished', 'tasks_completed',
+             'quotes_added', 'reading_streak', 'productivity_streak')
+
+
+def achievement_values(user, today=None):
+    """A user's counter values as a tuple in ``STAT_KEYS`` order.
+
+    Streaks count as of today, so the values change when a streak lapses.
+    """
+    values = badge_values(user)
+    for kind, field in STREAKS.items():
+        values[field] = current_streak(values, kind, today)
+    return tuple(values.get(key, 0) for key in STAT_KEYS)
+
+
+def achievements_etag(user_id, values):
+    """Entity tag for a user's achievements at these counter values"""
+    return hashlib.sha1(repr((str(user_id), values)).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def evaluate_achievements(values):
+    """The achievements response body for a tuple of counter values.
+
+    Cached: users with the same counters share one response. Callers must
+    not modify the result.
+    """
+    stats = dict(zip(STAT_KEYS, values))
+
+    grouped_achievements = {}
+    completed_count = 0
+    for achievement in ACHIEVEMENTS:
+        current = stats[achievement['key']]
+        completed = current >= achievement['threshold']
+        completed_count += completed
+        grouped_achievements.setdefault(achievement['category'], []).append({
+            'name': achievement['name'],
+            'description': achievement['description'],
+            'category': achievement['category'],
+            'threshold': achievement['threshold'],
+            'current': current,
+            'icon': achievement['icon'],
+            'completed': completed,
+            'progress': min(100, (current / achievement['threshold']) * 100)
+        })
+
+    return {
+        'achievements': grouped_achievements,
+        'stats': stats,
+        'completed_count': completed_count,
+        'total_count': len(ACHIEVEMENTS)
+    }
@@ -0,0 +1,185 @@
+"""
+Bucketed activity storage.
+
+With ``ACTIVITY_BUCKETS`` enabled, reading sessions and completed tasks are
+also kept in one document per user per UTC day (``reading_buckets`` and
+``task_buckets``): an ``events`` array plus running sums, so the analytics
+endpoints scan one small document per day instead of one per event.
+
+    {'user_id': ..., 'day': 2024-01-05 00:00, 'sessions': 3, 'pages_read': 42,
+     'duration_minutes': 55, 'events': [{'_id': <session id>, ...}, ...]}
+
+``reading_sessions`` and ``completed_tasks`` stay the source of truth: sync,
+delta sync and deduplication work on them as before. Events are keyed by
+the source document's ``_id`` and added with an upsert that skips events
+already in the bucket, so every write is safe to repeat. Sessions belong
+to the day they started; merged progress updates (``reading_sessions.py``)
+are applied to the session's entry in place.
+
+Buckets for existing data are built by ``python maintenance.py
+migrate-buckets``, which can run before or after the flag is turned on.
+"""
+
+from flask import current_app
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+BUCKET_COLLECTIONS = {
+    'reading_sessions': 'reading_buckets',
+    'completed_tasks': 'task_buckets'
+}
+
+
+def buckets_enabled():
+    return current_app.config.get('ACTIVITY_BUCKETS', False)
+
+
+def bucket_day(when):
+    """The UTC day bucket a timestamp falls in"""
+    return datetime(when.year, when.month, when.day)
+
+
+def _session_event(session):
+    return {
+        '_id': session['_id'],
+        'book_id': session['book_id'],
+        'date': session['date'],
+        'pages_read': session.get('pages_read', 0),
+        'duration_minutes': session.get('duration_minutes', 0),
+        'current_page': session.get('current_page', 0),
+        'notes': session.get('notes', '')
+    }
+
+
+def _task_event(task):
+    return {
+        '_id': task['_id'],
+        'task_name': task['task_name'],
+        'category': task.get('category', 'general'),
+        'timer_type': task.get('timer_type'),
+        'planned_duration': task.get('planned_duration'),
+        'actual_duration': task.get('actual_duration', 0),
+        'mood_rating': task.get('mood_rating'),
+        'notes': task.get('notes', ''),
+        'started_at': task.get('started_at'),
+        'completed_at': task['completed_at']
+    }
+
+
+def _add_event(user_id, day, event, sums):
+    # No match when the event is already there: the upsert then collides
+    # with the bucket on the unique (user_id, day) index and is ignored
+    return UpdateOne(
+        {'user_id': user_id, 'day': day, 'events._id': {'$ne': event['_id']}},
+        {'$push': {'events': event}, '$inc': sums},
+        upsert=True
+    )
+
+
+def session_operations(sessions):
+    return [
+        _add_event(session['user_id'], bucket_day(session['date']), _session_event(session), {
+            'sessions': 1,
+            'pages_read': session.get('pages_read', 0),
+            'duration_minutes': session.get('duration_minutes', 0)
+        })
+        for session in sessions
+    ]
+
+
+def task_operations(tasks):
+    return [
+        _add_event(task['user_id'], bucket_day(task['completed_at']), _task_event(task), {
+            'tasks': 1,
+            'focus_minutes': task.get('actual_duration', 0),
+            'mood_total': task.get('mood_rating') or 0,
+            'mood_count': 1 if task.get('mood_rating') else 0
+        })
+        for task in tasks
+    ]
+
+
+def write_buckets(collection, operations):
+    """Apply bucket upserts, ignoring events that are already bucketed.
+    Returns how many were skipped."""
+    if not operations:
+        return 0
+    try:
+        collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        return len(e.details['writeErrors'])
+    return 0
+
+
+def add_sessions(db, sessions):
+    """Bucket newly inserted reading sessions"""
+    if buckets_enabled():
+        write_buckets(db.reading_buckets, session_operations(sessions))
+
+
+def add_tasks(db, tasks):
+    """Bucket newly inserted completed tasks"""
+    if buckets_enabled():
+        write_buckets(db.task_buckets, task_operations(tasks))
+
+
+def update_session(db, session, pages_read, duration_minutes):
+    """Bucket a progress update. ``session`` is the session after it."""
+    if not buckets_enabled():
+        return
+
+    def update_entry():
+        return db.reading_buckets.update_one(
+            {'user_id': session['user_id'], 'day': bucket_day(session['date']), 'events._id': session['_id']},
+            {
+                '$inc': {
+                    'pages_read': pages_read,
+                    'duration_minutes': duration_minutes,
+                    'events.$.pages_read': pages_read,
+                    'events.$.duration_minutes': duration_minutes
+                },
+                '$max': {'events.$.current_page': session['current_page']},
+                '$set': {'events.$.notes': session.get('notes', '')}
+            }
+        ).matched_count
+
+    merged = session.get('updates', 1) > 1
+    if merged and update_entry():
+        return
+
+    # A new session, or one started before buckets were built: its
+    # current totals become the entry. If an earlier update of the session
+    # added the entry first, that entry lacks this update; apply it there.
+    if write_buckets(db.reading_buckets, session_operations([session])) and merged:
+        update_entry()
+
+
+def replace_session_events(db, user_id, day, remove_ids, session=None):
+    """Drop sessions' entries from a day bucket, and optionally put a
+    session's current totals in place of its entry. Repeatable."""
+    if not buckets_enabled():
+        return
+
+    replaced = list(remove_ids) + ([session['_id']] if session else [])
+    old = {'$filter': {'input': '$events', 'as': 'event', 'cond': {'$in': ['$$event._id', replaced]}}}
+    kept = {'$filter': {'input': '$events', 'as': 'event', 'cond': {'$not': [{'$in': ['$$event._id', replaced]}]}}}
+    new = [_session_event(session)] if session else []
+
+    def adjusted(field):
+        return {'$add': [
+            {'$ifNull': [f'${field}', 0]},
+            {'$multiply': [-1, {'$sum': {'$map': {'input': old, 'as': 'event', 'in': f'$$event.{field}'}}}]},
+            sum(event[field] for event in new)
+        ]}
+
+    db.reading_buckets.update_one({'user_id': user_id, 'day': day}, [{'$set': {
+        'sessions': {'$add': [{'$ifNull': ['$sessions', 0]}, {'$multiply': [-1, {'$size': old}]}, len(new)]},
+        'pages_read': adjusted('pages_read'),
+        'duration_minutes': adjusted('duration_minutes'),
+        'events': {'$concatArrays': [kept, {'$literal': new}]}
+    }}])
@@ -1,96 +1,118 @@
-from flask import Flask, request, jsonify
-from flask_pymongo import PyMongo
-from flask_login import LoginManager
-from flask_cors import CORS
-from flask_jwt_extended import JWTManager
-from datetime import timedelta
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Import blueprints
-from blueprints.auth import auth_bp
-from blueprints.nook import nook_bp
-from blueprints.hook import hook_bp
-from blueprints.clubs import clubs_bp
-from blueprints.mini_modules import mini_modules_bp
-from blueprints.rewards import rewards_bp
-from blueprints.dashboard import dashboard_bp
-from blueprints.admin import admin_bp
-from blueprints.themes import themes_bp
-from blueprints.quotes import quotes_bp
-
-# Import models
-from models import User
-
-
-def create_app():
-    app = Flask(__name__)
-
-    # Configuration
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-    app.config['MONGO_URI'] = os.environ.get(
-        'MONGO_URI', 'mongodb://localhost:27017/hooks_mobile')
-    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key')
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
-
-    # Initialize extensions
-    mongo = PyMongo(app)
-    CORS(app)
-    jwt = JWTManager(app)
-
-    # Login manager setup
-    login_manager = LoginManager()
-    login_manager.init_app(app)
-    login_manager.login_view = 'auth.login'
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        user_data = mongo.db.users.find_one({'_id': user_id})
-        if user_data:
-            return User(user_data)
-        return None
-
-    # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(nook_bp, url_prefix='/api/nook')
-    app.register_blueprint(hook_bp, url_prefix='/api/hook')
-    app.register_blueprint(clubs_bp, url_prefix='/api/clubs')
-    app.register_blueprint(mini_modules_bp, url_prefix='/api/mini-modules')
-    app.register_blueprint(rewards_bp, url_prefix='/api/rewards')
-    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    app.register_blueprint(themes_bp, url_prefix='/api/themes')
-    app.register_blueprint(quotes_bp, url_prefix='/api/quotes')
-
-    # Store mongo instance in app
-    app.mongo = mongo
-
-    # Root endpoint for health checks
-    @app.route('/')
-    def root():
-        return jsonify({
-            'status': 'online',
-            'message': 'Hooks Mobile API',
-            'version': '1.0',
-            'health_endpoint': '/api/health'
-        })
-    
-    # Health check endpoint
-    @app.route('/api/health')
-    def health_check():
-        return jsonify({'status': 'healthy', 'message': 'Hooks Mobile API is running'})
-
-    return app
-
-
-# Create the application instance at module level
-app = create_app()
-
-
-# Keep this block only for local development (optional)
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+from flask import Flask, request, jsonify
+from flask_pymongo import PyMongo
+from flask_login import LoginManager
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+from datetime import timedelta
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Import blueprints
+from blueprints.auth import auth_bp
+from blueprints.nook import nook_bp
+from blueprints.hook import hook_bp
+from blueprints.clubs import clubs_bp
+from blueprints.mini_modules import mini_modules_bp
+from blueprints.rewards import rewards_bp
+from blueprints.dashboard import dashboard_bp
+from blueprints.admin import admin_bp
+from blueprints.themes import themes_bp
+from blueprints.quotes import quotes_bp
+from blueprints.sync import sync_bp
+
+# Import models
+from models import User
+from serialization import ApiRequest, MongoJSONProvider
+import compression
+import rewards_buffer
+import timer_events
+import timer_expiry
+
+
+def create_app():
+    app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
+    app.request_class = ApiRequest
+
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    app.config['MONGO_URI'] = os.environ.get(
+        'MONGO_URI', 'mongodb://localhost:27017/hooks_mobile')
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['REWARDS_WRITE_BEHIND'] = os.environ.get('REWARDS_WRITE_BEHIND', 'false').lower() == 'true'
+    app.config['TIMER_EVENTS_REDIS_URL'] = os.environ.get('TIMER_EVENTS_REDIS_URL')
+    app.config['TIMER_SWEEPER_ENABLED'] = os.environ.get('TIMER_SWEEPER_ENABLED', 'false').lower() == 'true'
+    app.config['TIMER_EXPIRY_POLICY'] = os.environ.get('TIMER_EXPIRY_POLICY', 'complete')
+    app.config['READING_SESSION_MERGE_MINUTES'] = int(os.environ.get('READING_SESSION_MERGE_MINUTES', 30))
+    app.config['ACTIVITY_BUCKETS'] = os.environ.get('ACTIVITY_BUCKETS', 'false').lower() == 'true'
+    app.config['REWARDS_ARCHIVE_MONTHS'] = int(os.environ.get('REWARDS_ARCHIVE_MONTHS', 12))
+    app.config['COLD_STORAGE_AFTER_DAYS'] = int(os.environ.get('COLD_STORAGE_AFTER_DAYS', 180))
+
+    # Initialize extensions
+    mongo = PyMongo(app)
+    CORS(app)
+    jwt = JWTManager(app)
+    compression.init_app(app)
+    timer_events.init_app(app)
+
+    # Login manager setup
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        user_data = mongo.db.users.find_one({'_id': user_id})
+        if user_data:
+            return User(user_data)
+        return None
+
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(nook_bp, url_prefix='/api/nook')
+    app.register_blueprint(hook_bp, url_prefix='/api/hook')
+    app.register_blueprint(clubs_bp, url_prefix='/api/clubs')
+    app.register_blueprint(mini_modules_bp, url_prefix='/api/mini-modules')
+    app.register_blueprint(rewards_bp, url_prefix='/api/rewards')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(themes_bp, url_prefix='/api/themes')
+    app.register_blueprint(quotes_bp, url_prefix='/api/quotes')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+
+    # Store mongo instance in app
+    app.mongo = mongo
+    rewards_buffer.init_app(app)
+    timer_expiry.init_app(app)
+
+    # Root endpoint for health checks
+    @app.route('/')
+    def root():
+        return jsonify({
+            'status': 'online',
+            'message': 'Hooks Mobile API',
+            'version': '1.0',
+            'health_endpoint': '/api/health'
+        })
+    
+    # Health check endpoint
+    @app.route('/api/health')
+    def health_check():
+        return jsonify({'status': 'healthy', 'message': 'Hooks Mobile API is running'})
+
+    return app
+
+
+# Create the application instance at module level
+app = create_app()
+
+
+# Keep this block only for local development (optional)
+if __name__ == '__main__':
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,122 @@
+"""
+Badge awarding.
+
+Badges are earned when a user's maintained counters (``users.stats``, plus
+``users.points``) reach a badge's ``requirements``. Instead of re-checking
+every badge on every request, the catalog is indexed by requirement key:
+each key maps to its badges sorted by threshold. A write path passes the
+keys it changed, and only those badges are checked, with a bisect against
+the counter's new value.
+
+Earned badges are inserted into ``user_badges`` with ``insert_many``;
+the unique ``(user_id, badge_id)`` index makes concurrent or repeated
+awards of the same badge harmless. Their ids are also kept on the user in
+``badge_ids``, so the common case of "nothing new" costs no extra read.
+"""
+
+from bisect import bisect_right
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+import threading
+import time
+
+DUPLICATE_KEY_ERROR = 11000
+
+# How long a process keeps its copy of the badge catalog
+CATALOG_TTL = 300
+
+
+class BadgeIndex:
+    """The badge catalog indexed by requirement key"""
+
+    def __init__(self, badges):
+        self.requirements = {}
+        by_key = {}
+        for badge in badges:
+            requirements = badge.get('requirements') or {}
+            self.requirements[badge['_id']] = requirements
+            for key, threshold in requirements.items():
+                by_key.setdefault(key, []).append((threshold, badge['_id']))
+
+        self.thresholds = {}
+        self.badge_ids = {}
+        for key, entries in by_key.items():
+            entries.sort(key=lambda entry: entry[0])
+            self.thresholds[key] = [threshold for threshold, _ in entries]
+            self.badge_ids[key] = [badge_id for _, badge_id in entries]
+
+    def earned(self, values, keys, already_earned=()):
+        """Ids of badges reached on any of ``keys`` and not already earned"""
+        earned = set(already_earned)
+        new = []
+        for key in keys:
+            if key not in self.thresholds:
+                continue
+            reached = bisect_right(self.thresholds[key], values.get(key, 0))
+            for badge_id in self.badge_ids[key][:reached]:
+                if badge_id in earned:
+                    continue
+                # Badges with several requirements need all of them
+                if all(values.get(k, 0) >= t for k, t in self.requirements[badge_id].items()):
+                    new.append(badge_id)
+                    earned.add(badge_id)
+        return new
+
+    @property
+    def keys(self):
+        return list(self.thresholds)
+
+
+_index = None
+_index_loaded = 0
+_index_lock = threading.Lock()
+
+
+def get_index(db):
+    """This process's badge index, reloaded every ``CATALOG_TTL`` seconds"""
+    global _index, _index_loaded
+    if _index is None or time.monotonic() - _index_loaded > CATALOG_TTL:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_loaded > CATALOG_TTL:
+                _index = BadgeIndex(db.badges.find({}, {'requirements': 1}))
+                _index_loaded = time.monotonic()
+    return _index
+
+
+def badge_values(user):
+    """Counter values badges are evaluated against"""
+    values = dict(user.get('stats') or {})
+    values['points'] = user.get('points', 0)
+    return values
+
+
+def insert_user_badges(db, user_badges):
+    """Insert user_badges rows, skipping ones that already exist"""
+    if not user_badges:
+        return
+    try:
+        db.user_badges.insert_many(user_badges, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+
+
+def check_badges(db, user, changed_keys):
+    """Award badges reached by a change to ``changed_keys``.
+
+    ``user`` is the post-update document with ``points``, ``stats`` and
+    ``badge_ids``. Returns the ids of newly earned badges.
+    """
+    index = get_index(db)
+    new = index.earned(badge_values(user), changed_keys, user.get('badge_ids') or ())
+    if not new:
+        return []
+
+    now = datetime.utcnow()
+    insert_user_badges(db, [
+        {'user_id': user['_id'], 'badge_id': badge_id, 'earned_at': now}
+        for badge_id in new
+    ])
+    db.users.update_one({'_id': user['_id']}, {'$addToSet': {'badge_ids': {'$each': new}}})
+    user['badge_ids'] = list(user.get('badge_ids') or []) + new
+    return new
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Event documents vs day buckets for reading sessions and completed tasks
+
+Generates activity for a set of users in a scratch database, builds the
+day buckets from it (as ``maintenance.py migrate-buckets`` does) and
+reports document count, storage and index size per layout, plus the median
+latency of the nook, hook and dashboard analytics endpoints with
+ACTIVITY_BUCKETS off and on.
+
+Needs a running MongoDB. The database named in BENCH_MONGO_URI is dropped
+first. Run from the backend directory:
+    python benchmarks/bench_activity_buckets.py --users 200 --days 180
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['MONGO_URI'] = os.environ.get('BENCH_MONGO_URI', 'mongodb://localhost:27017/nhooks_bench_buckets')
+
+from flask_jwt_extended import create_access_token
+from activity_buckets import session_operations, task_operations, write_buckets
+from app import create_app
+from init_database import create_indexes
+
+SAMPLE_USERS = 20
+ENDPOINTS = (
+    '/api/nook/analytics?days=30',
+    '/api/hook/analytics?days=30',
+    '/api/dashboard/analytics?days=30'
+)
+CATEGORIES = ('general', 'work', 'study', 'break')
+
+
+def generate(db, users, days):
+    now = datetime.utcnow()
+    user_ids = [ObjectId() for _ in range(users)]
+    db.users.insert_many([{'_id': user_id, 'username': f'bench{i}', 'points': 0, 'stats': {}}
+                          for i, user_id in enumerate(user_ids)])
+
+    for user_id in user_ids:
+        book_ids = [ObjectId() for _ in range(5)]
+        db.books.insert_many([{'_id': book_id, 'user_id': user_id, 'title': 'Bench', 'status': 'reading',
+                               'genre': random.choice(('Fiction', 'History'))} for book_id in book_ids])
+        sessions = []
+        tasks = []
+        for day in range(days):
+            midnight = datetime(now.year, now.month, now.day) - timedelta(days=day)
+            for _ in range(random.randint(0, 6)):
+                sessions.append({
+                    'user_id': user_id,
+                    'book_id': random.choice(book_ids),
+                    'pages_read': random.randint(1, 40),
+                    'current_page': random.randint(1, 400),
+                    'duration_minutes': random.randint(5, 60),
+                    'notes': '',
+                    'date': midnight + timedelta(minutes=random.randint(0, 1439)),
+                    'updated_at': now
+                })
+            for _ in range(random.randint(0, 8)):
+                tasks.append({
+                    'user_id': user_id,
+                    'task_name': 'Focus',
+                    'planned_duration': 25,
+                    'actual_duration': random.randint(5, 50),
+                    'category': random.choice(CATEGORIES),
+                    'timer_type': 'work',
+                    'mood_rating': random.choice((None, 3, 4, 5)),
+                    'notes': '',
+                    'completed_at': midnight + timedelta(minutes=random.randint(0, 1439)),
+                    'updated_at': now
+                })
+        if sessions:
+            db.reading_sessions.insert_many(sessions)
+            write_buckets(db.reading_buckets, session_operations(sessions))
+        if tasks:
+            db.completed_tasks.insert_many(tasks)
+            write_buckets(db.task_buckets, task_operations(tasks))
+
+    return user_ids
+
+
+def collection_stats(db, name):
+    stats = db.command('collStats', name)
+    return stats['count'], stats['storageSize'], stats['totalIndexSize']
+
+
+def median_ms(client, url, headers):
+    timings = []
+    for user_headers in headers:
+        started = time.perf_counter()
+        response = client.get(url, headers=user_headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=180)
+    args = parser.parse_args()
+
+    random.seed(7)
+    app = create_app()
+    db = app.mongo.db
+    db.client.drop_database(db.name)
+    create_indexes(app.mongo)
+
+    started = time.monotonic()
+    user_ids = generate(db, args.users, args.days)
+    print(f'Generated {args.users} users x {args.days} days in {time.monotonic() - started:.1f}s\n')
+
+    header = f'{"collection":<20}{"documents":>11}{"storage KB":>12}{"index KB":>10}'
+    print(header)
+    print('-' * len(header))
+    for name in ('reading_sessions', 'reading_buckets', 'completed_tasks', 'task_buckets'):
+        count, storage, indexes = collection_stats(db, name)
+        print(f'{name:<20}{count:>11}{storage // 1024:>12}{indexes // 1024:>10}')
+
+    with app.app_context():
+        headers = [{'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+                   for user_id in user_ids[:SAMPLE_USERS]]
+
+    client = app.test_client()
+    print(f'\n{"endpoint":<36}{"events ms":>11}{"buckets ms":>12}')
+    print('-' * 59)
+    for url in ENDPOINTS:
+        app.config['ACTIVITY_BUCKETS'] = False
+        events = median_ms(client, url, headers)
+        app.config['ACTIVITY_BUCKETS'] = True
+        buckets = median_ms(client, url, headers)
+        print(f'{url:<36}{events:>11.2f}{buckets:>12.2f}')
+
+    db.client.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    main()
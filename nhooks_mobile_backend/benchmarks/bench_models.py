@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Model serialization microbenchmark for 100-row list endpoints
+
+Compares the legacy pattern (instantiate a dict-backed model per row, then call
+to_dict()) with Record.serialize_many(), reporting time and peak memory
+allocated per page, plus the footprint of a single model instance.
+
+Run from the backend directory:
+    python benchmarks/bench_models.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_serialization import make_books
+from models import Book
+
+PAGE_SIZE = 100
+REPEAT = 5
+NUMBER = 500
+
+
+class LegacyBook:
+    """Dict-backed Book as it was before the slotted record types"""
+
+    def __init__(self, book_data):
+        self.id = str(book_data['_id']) if '_id' in book_data else None
+        self.user_id = str(book_data['user_id'])
+        self.title = book_data['title']
+        self.authors = book_data.get('authors', [])
+        self.description = book_data.get('description', '')
+        self.page_count = book_data.get('page_count', 0)
+        self.current_page = book_data.get('current_page', 0)
+        self.status = book_data.get('status', 'to_read')
+        self.rating = book_data.get('rating', 0)
+        self.cover_image = book_data.get('cover_image', '')
+        self.genre = book_data.get('genre', '')
+        self.isbn = book_data.get('isbn', '')
+        self.added_at = book_data.get('added_at')
+        self.finished_at = book_data.get('finished_at')
+        self.quotes = book_data.get('quotes', [])
+        self.takeaways = book_data.get('takeaways', [])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'title': self.title,
+            'authors': self.authors,
+            'description': self.description,
+            'page_count': self.page_count,
+            'current_page': self.current_page,
+            'status': self.status,
+            'rating': self.rating,
+            'cover_image': self.cover_image,
+            'genre': self.genre,
+            'isbn': self.isbn,
+            'added_at': self.added_at.isoformat() if self.added_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'quotes': self.quotes,
+            'takeaways': self.takeaways,
+            'progress_percentage': (self.current_page / max(1, self.page_count)) * 100
+        }
+
+
+def legacy(docs):
+    return [LegacyBook(doc).to_dict() for doc in docs]
+
+
+def bulk(docs):
+    return Book.serialize_many(docs)
+
+
+def allocated_bytes(func, docs):
+    tracemalloc.start()
+    func(docs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def instance_size(instance):
+    size = sys.getsizeof(instance)
+    if hasattr(instance, '__dict__'):
+        size += sys.getsizeof(instance.__dict__)
+    return size
+
+
+def main():
+    docs = make_books(PAGE_SIZE)
+
+    print(f'Page size: {PAGE_SIZE} rows, best of {REPEAT} x {NUMBER} runs\n')
+    print(f'{"path":<22}{"time (ms)":>12}{"peak alloc (KiB)":>19}')
+
+    for name, func in (('instance + to_dict', legacy), ('serialize_many', bulk)):
+        elapsed = min(timeit.repeat(lambda: func(docs), repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+        peak = allocated_bytes(func, docs) / 1024
+        print(f'{name:<22}{elapsed:>12.3f}{peak:>19.1f}')
+
+    print(f'\nInstance size: dict-backed {instance_size(LegacyBook(docs[0]))} bytes, '
+          f'slotted {instance_size(Book(docs[0]))} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for 100-item list pages
+
+Compares the legacy path (per-field isoformat/str conversion in to_dict plus
+Flask's stdlib JSON provider) against MongoJSONProvider encoding raw documents.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from serialization import MongoJSONProvider, orjson
+
+PAGE_SIZE = 100
+REPEAT = 5
+NUMBER = 200
+
+
+def make_books(count):
+    user_id = ObjectId()
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'title': f'Book {i}',
+        'authors': ['Author One', 'Author Two'],
+        'description': 'A reasonably long description of the book. ' * 4,
+        'page_count': 320,
+        'current_page': i,
+        'status': 'reading',
+        'rating': 4,
+        'cover_image': 'https://books.google.com/books/content?id=abc&printsec=frontcover',
+        'genre': 'Self-Help',
+        'isbn': '9780735211292',
+        'added_at': now - timedelta(days=i),
+        'finished_at': None,
+        'quotes': [{'text': 'Quote text', 'page': '12', 'context': '', 'added_at': now}],
+        'takeaways': [{'takeaway': 'Takeaway', 'page_reference': '', 'added_at': now}]
+    } for i in range(count)]
+
+
+def make_sessions(count):
+    user_id = ObjectId()
+    book_id = ObjectId()
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'book_id': book_id,
+        'pages_read': 12,
+        'current_page': i * 12,
+        'duration_minutes': 20,
+        'notes': '',
+        'date': now - timedelta(hours=i)
+    } for i in range(count)]
+
+
+def legacy_convert(doc):
+    """Per-field conversion as done by the old to_dict/handler loops"""
+    converted = {}
+    for key, value in doc.items():
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, list):
+            value = [legacy_convert(item) if isinstance(item, dict) else item for item in value]
+        converted[key] = value
+    return converted
+
+
+def main():
+    app = Flask(__name__)
+    legacy = DefaultJSONProvider(app)
+    fast = MongoJSONProvider(app)
+
+    print(f'Encoder: {"orjson " + orjson.__version__ if orjson else "stdlib json"}')
+    print(f'Page size: {PAGE_SIZE} items, best of {REPEAT} x {NUMBER} runs\n')
+    print(f'{"payload":<20}{"before (ms)":>14}{"after (ms)":>14}{"speedup":>10}')
+
+    for name, docs in (('books', make_books(PAGE_SIZE)), ('reading_sessions', make_sessions(PAGE_SIZE))):
+        with app.app_context():
+            before = min(timeit.repeat(
+                lambda: legacy.dumps({'items': [legacy_convert(d) for d in docs]}),
+                repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+            after = min(timeit.repeat(
+                lambda: fast.dumps({'items': docs}),
+                repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+        print(f'{name:<20}{before:>14.3f}{after:>14.3f}{before / after:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
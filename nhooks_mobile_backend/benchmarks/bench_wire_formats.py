@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+JSON vs MessagePack wire format benchmark
+
+Encodes representative dashboard/analytics (365 days) and nook/books
+payloads with both formats and reports payload size (raw and gzipped) and
+encode/decode time.
+
+Run from the backend directory:
+    python benchmarks/bench_wire_formats.py
+"""
+
+import gzip
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_serialization import make_books
+from models import Book
+from serialization import dumps_bytes, loads, packb, unpackb, orjson
+
+REPEAT = 5
+NUMBER = 100
+
+
+def make_analytics(days=365):
+    today = datetime.utcnow().date()
+    dates = [(today - timedelta(days=i)).isoformat() for i in reversed(range(days))]
+    return {
+        'daily_reading': [{
+            'date': date,
+            'pages_read': random.randint(0, 80),
+            'reading_time': random.randint(0, 120),
+            'sessions': random.randint(0, 4)
+        } for date in dates],
+        'daily_productivity': [{
+            'date': date,
+            'tasks_completed': random.randint(0, 8),
+            'focus_time': random.randint(0, 240),
+            'avg_mood': round(random.uniform(0, 5), 2)
+        } for date in dates],
+        'daily_points': [{
+            'date': date,
+            'points': random.randint(0, 120),
+            'sources': {'nook': random.randint(0, 60), 'hook': random.randint(0, 60)}
+        } for date in dates],
+        'task_categories': [
+            {'_id': category, 'count': random.randint(1, 200), 'total_time': random.randint(10, 5000)}
+            for category in ('general', 'work', 'study', 'break')
+        ],
+        'book_genres': [
+            {'_id': genre, 'count': random.randint(1, 40)}
+            for genre in ('Self-Help', 'Productivity', 'Fiction', 'History')
+        ]
+    }
+
+
+def make_books_page(limit=20):
+    return {
+        'books': Book.serialize_many(make_books(limit)),
+        'stats': {'total_books': 120, 'to_read': 40, 'reading': 5, 'finished': 75},
+        'pagination': {'page': 1, 'limit': limit, 'total': 120, 'pages': (120 + limit - 1) // limit}
+    }
+
+
+def best_ms(func):
+    return min(timeit.repeat(func, repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+
+
+def main():
+    random.seed(7)
+    payloads = (
+        ('dashboard/analytics', make_analytics()),
+        ('nook/books (20)', make_books_page(20)),
+        ('nook/books (100)', make_books_page(100))
+    )
+
+    print(f'JSON encoder: {"orjson " + orjson.__version__ if orjson else "stdlib json"}\n')
+    header = f'{"payload":<22}{"format":<9}{"bytes":>9}{"gzip":>9}{"encode ms":>11}{"decode ms":>11}'
+    print(header)
+    print('-' * len(header))
+
+    for name, payload in payloads:
+        for fmt, encode, decode in (('json', dumps_bytes, loads), ('msgpack', packb, unpackb)):
+            data = encode(payload)
+            print(f'{name:<22}{fmt:<9}{len(data):>9}{len(gzip.compress(data)):>9}'
+                  f'{best_ms(lambda: encode(payload)):>11.3f}{best_ms(lambda: decode(data)):>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
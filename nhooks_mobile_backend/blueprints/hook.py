@@ -1,446 +1,537 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from bson import ObjectId
-from datetime import datetime, timedelta
-from models import Timer, Reward
-
-hook_bp = Blueprint('hook', __name__)
-
-@hook_bp.route('/timers/active', methods=['GET'])
-@jwt_required()
-def get_active_timer():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get active timer
-        timer_data = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(current_user_id)})
-        
-        if not timer_data:
-            return jsonify({'timer': None}), 200
-        
-        timer = Timer(timer_data)
-        
-        return jsonify({'timer': timer.to_dict()}), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get active timer', 'details': str(e)}), 500
-
-@hook_bp.route('/timers/start', methods=['POST'])
-@jwt_required()
-def start_timer():
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data.get('task_name') or not data.get('duration'):
-            return jsonify({'error': 'Task name and duration are required'}), 400
-        
-        # Check if user already has an active timer
-        existing_timer = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(current_user_id)})
-        
-        if existing_timer:
-            return jsonify({'error': 'You already have an active timer. Please complete or cancel it first.'}), 409
-        
-        # Create new timer
-        timer_data = {
-            'user_id': ObjectId(current_user_id),
-            'task_name': data['task_name'],
-            'duration': int(data['duration']),  # in minutes
-            'category': data.get('category', 'general'),
-            'timer_type': data.get('timer_type', 'work'),  # work or break
-            'status': 'active',
-            'started_at': datetime.utcnow(),
-            'paused_at': None,
-            'completed_at': None,
-            'total_paused_time': 0,
-            'mood_rating': None,
-            'notes': ''
-        }
-        
-        result = current_app.mongo.db.active_timers.insert_one(timer_data)
-        timer_data['_id'] = result.inserted_id
-        
-        timer = Timer(timer_data)
-        
-        return jsonify({
-            'message': 'Timer started successfully',
-            'timer': timer.to_dict()
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to start timer', 'details': str(e)}), 500
-
-@hook_bp.route('/timers/pause', methods=['POST'])
-@jwt_required()
-def pause_timer():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get active timer
-        timer_data = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(current_user_id)})
-        
-        if not timer_data:
-            return jsonify({'error': 'No active timer found'}), 404
-        
-        current_time = datetime.utcnow()
-        
-        if timer_data['status'] == 'active':
-            # Pause the timer
-            current_app.mongo.db.active_timers.update_one(
-                {'_id': timer_data['_id']},
-                {
-                    '$set': {
-                        'status': 'paused',
-                        'paused_at': current_time
-                    }
-                }
-            )
-            message = 'Timer paused'
-        
-        elif timer_data['status'] == 'paused':
-            # Resume the timer
-            paused_duration = (current_time - timer_data['paused_at']).total_seconds()
-            
-            current_app.mongo.db.active_timers.update_one(
-                {'_id': timer_data['_id']},
-                {
-                    '$set': {
-                        'status': 'active',
-                        'paused_at': None
-                    },
-                    '$inc': {
-                        'total_paused_time': paused_duration
-                    }
-                }
-            )
-            message = 'Timer resumed'
-        
-        else:
-            return jsonify({'error': 'Timer cannot be paused/resumed in current state'}), 400
-        
-        # Get updated timer
-        updated_timer_data = current_app.mongo.db.active_timers.find_one({'_id': timer_data['_id']})
-        timer = Timer(updated_timer_data)
-        
-        return jsonify({
-            'message': message,
-            'timer': timer.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to pause/resume timer', 'details': str(e)}), 500
-
-@hook_bp.route('/timers/complete', methods=['POST'])
-@jwt_required()
-def complete_timer():
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Get active timer
-        timer_data = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(current_user_id)})
-        
-        if not timer_data:
-            return jsonify({'error': 'No active timer found'}), 404
-        
-        current_time = datetime.utcnow()
-        
-        # Calculate actual duration
-        if timer_data['status'] == 'paused':
-            actual_duration = (timer_data['paused_at'] - timer_data['started_at']).total_seconds()
-        else:
-            actual_duration = (current_time - timer_data['started_at']).total_seconds()
-        
-        actual_duration -= timer_data.get('total_paused_time', 0)
-        actual_duration_minutes = max(1, int(actual_duration / 60))  # At least 1 minute
-        
-        # Update timer as completed
-        update_data = {
-            'status': 'completed',
-            'completed_at': current_time,
-            'mood_rating': data.get('mood_rating'),
-            'notes': data.get('notes', '')
-        }
-        
-        current_app.mongo.db.active_timers.update_one(
-            {'_id': timer_data['_id']},
-            {'$set': update_data}
-        )
-        
-        # Move to completed tasks
-        completed_task_data = {
-            'user_id': ObjectId(current_user_id),
-            'task_name': timer_data['task_name'],
-            'planned_duration': timer_data['duration'],
-            'actual_duration': actual_duration_minutes,
-            'category': timer_data['category'],
-            'timer_type': timer_data['timer_type'],
-            'mood_rating': data.get('mood_rating'),
-            'notes': data.get('notes', ''),
-            'completed_at': current_time,
-            'started_at': timer_data['started_at']
-        }
-        
-        current_app.mongo.db.completed_tasks.insert_one(completed_task_data)
-        
-        # Remove from active timers
-        current_app.mongo.db.active_timers.delete_one({'_id': timer_data['_id']})
-        
-        # Award points (1 point per 5 minutes of focus time)
-        points_earned = max(1, actual_duration_minutes // 5)
-        
-        # Bonus points for good mood rating
-        if data.get('mood_rating') and data['mood_rating'] >= 4:
-            points_earned += 2
-        
-        # Award points
-        reward_data = {
-            'user_id': ObjectId(current_user_id),
-            'points': points_earned,
-            'source': 'hook',
-            'description': f'Completed {timer_data["task_name"]} ({actual_duration_minutes} min)',
-            'earned_at': current_time,
-            'metadata': {
-                'task_name': timer_data['task_name'],
-                'duration': actual_duration_minutes,
-                'category': timer_data['category']
-            }
-        }
-        
-        current_app.mongo.db.rewards.insert_one(reward_data)
-        current_app.mongo.db.users.update_one(
-            {'_id': ObjectId(current_user_id)},
-            {'$inc': {'points': points_earned}}
-        )
-        
-        return jsonify({
-            'message': 'Timer completed successfully',
-            'points_earned': points_earned,
-            'actual_duration': actual_duration_minutes
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to complete timer', 'details': str(e)}), 500
-
-@hook_bp.route('/timers/cancel', methods=['POST'])
-@jwt_required()
-def cancel_timer():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get active timer
-        timer_data = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(current_user_id)})
-        
-        if not timer_data:
-            return jsonify({'error': 'No active timer found'}), 404
-        
-        # Remove active timer
-        current_app.mongo.db.active_timers.delete_one({'_id': timer_data['_id']})
-        
-        return jsonify({'message': 'Timer cancelled successfully'}), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to cancel timer', 'details': str(e)}), 500
-
-@hook_bp.route('/tasks', methods=['GET'])
-@jwt_required()
-def get_tasks():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get query parameters
-        category = request.args.get('category')
-        days = int(request.args.get('days', 30))
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        
-        # Build query
-        query = {'user_id': ObjectId(current_user_id)}
-        
-        if category:
-            query['category'] = category
-        
-        if days > 0:
-            start_date = datetime.utcnow() - timedelta(days=days)
-            query['completed_at'] = {'$gte': start_date}
-        
-        # Get tasks with pagination
-        skip = (page - 1) * limit
-        tasks_cursor = current_app.mongo.db.completed_tasks.find(query).sort('completed_at', -1).skip(skip).limit(limit)
-        tasks = list(tasks_cursor)
-        
-        # Convert ObjectId to string for JSON serialization
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            task['user_id'] = str(task['user_id'])
-            if isinstance(task.get('completed_at'), datetime):
-                task['completed_at'] = task['completed_at'].isoformat()
-            if isinstance(task.get('started_at'), datetime):
-                task['started_at'] = task['started_at'].isoformat()
-        
-        # Get total count
-        total_count = current_app.mongo.db.completed_tasks.count_documents(query)
-        
-        return jsonify({
-            'tasks': tasks,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total_count,
-                'pages': (total_count + limit - 1) // limit
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get tasks', 'details': str(e)}), 500
-
-@hook_bp.route('/analytics', methods=['GET'])
-@jwt_required()
-def get_analytics():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get date range
-        days = int(request.args.get('days', 30))
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Get completed tasks in date range
-        tasks = list(current_app.mongo.db.completed_tasks.find({
-            'user_id': ObjectId(current_user_id),
-            'completed_at': {'$gte': start_date}
-        }))
-        
-        # Calculate statistics
-        total_tasks = len(tasks)
-        total_time = sum(task.get('actual_duration', 0) for task in tasks)
-        avg_session_length = total_time / max(1, total_tasks)
-        
-        # Calculate productivity streak
-        productivity_streak = 0
-        current_date = datetime.utcnow().date()
-        
-        while True:
-            day_tasks = current_app.mongo.db.completed_tasks.count_documents({
-                'user_id': ObjectId(current_user_id),
-                'completed_at': {
-                    '$gte': datetime.combine(current_date, datetime.min.time()),
-                    '$lt': datetime.combine(current_date + timedelta(days=1), datetime.min.time())
-                }
-            })
-            
-            if day_tasks > 0:
-                productivity_streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                break
-        
-        # Category breakdown
-        category_stats = {}
-        for task in tasks:
-            category = task.get('category', 'general')
-            if category not in category_stats:
-                category_stats[category] = {'count': 0, 'time': 0}
-            category_stats[category]['count'] += 1
-            category_stats[category]['time'] += task.get('actual_duration', 0)
-        
-        # Daily productivity (last 7 days)
-        daily_productivity = []
-        for i in range(7):
-            date = datetime.utcnow().date() - timedelta(days=i)
-            day_tasks = list(current_app.mongo.db.completed_tasks.find({
-                'user_id': ObjectId(current_user_id),
-                'completed_at': {
-                    '$gte': datetime.combine(date, datetime.min.time()),
-                    '$lt': datetime.combine(date + timedelta(days=1), datetime.min.time())
-                }
-            }))
-            
-            daily_productivity.append({
-                'date': date.isoformat(),
-                'tasks': len(day_tasks),
-                'time': sum(task.get('actual_duration', 0) for task in day_tasks)
-            })
-        
-        daily_productivity.reverse()  # Show oldest to newest
-        
-        return jsonify({
-            'total_tasks': total_tasks,
-            'total_time': total_time,
-            'avg_session_length': avg_session_length,
-            'productivity_streak': productivity_streak,
-            'category_stats': category_stats,
-            'daily_productivity': daily_productivity,
-            'recent_tasks': tasks[-10:] if tasks else []
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get analytics', 'details': str(e)}), 500
-
-@hook_bp.route('/presets', methods=['GET'])
-@jwt_required()
-def get_presets():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get user preferences
-        user_data = current_app.mongo.db.users.find_one({'_id': ObjectId(current_user_id)})
-        
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Default presets
-        default_presets = [
-            {'name': 'Pomodoro', 'duration': 25, 'type': 'work', 'category': 'general', 'color': 'red'},
-            {'name': 'Short Break', 'duration': 5, 'type': 'break', 'category': 'break', 'color': 'orange'},
-            {'name': 'Long Break', 'duration': 15, 'type': 'break', 'category': 'break', 'color': 'green'},
-            {'name': 'Deep Work', 'duration': 90, 'type': 'work', 'category': 'work', 'color': 'blue'},
-            {'name': 'Quick Task', 'duration': 10, 'type': 'work', 'category': 'general', 'color': 'purple'}
-        ]
-        
-        # User custom presets
-        custom_presets = user_data.get('preferences', {}).get('timer_presets', [])
-        
-        return jsonify({
-            'default_presets': default_presets,
-            'custom_presets': custom_presets
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get presets', 'details': str(e)}), 500
-
-@hook_bp.route('/presets', methods=['POST'])
-@jwt_required()
-def save_preset():
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['name', 'duration', 'type', 'category']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        # Create preset
-        preset = {
-            'name': data['name'],
-            'duration': int(data['duration']),
-            'type': data['type'],
-            'category': data['category'],
-            'color': data.get('color', 'blue')
-        }
-        
-        # Add to user preferences
-        current_app.mongo.db.users.update_one(
-            {'_id': ObjectId(current_user_id)},
-            {'$push': {'preferences.timer_presets': preset}}
-        )
-        
-        return jsonify({
-            'message': 'Preset saved successfully',
-            'preset': preset
-        }), 201
-        
-    except Exception as e:
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models import Timer, Reward
+from activity_buckets import add_tasks, bucket_day, buckets_enabled
+from points import award_points
+from streaks import current_streak
+from timer_events import cached_active_timer, format_event, publish_timer
+from timer_expiry import COMPLETION_RETRY_AFTER
+import time
+
+hook_bp = Blueprint('hook', __name__)
+
+@hook_bp.route('/timers/active', methods=['GET'])
+@jwt_required()
+def get_active_timer():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Served from the write-through cache; clients derive the remaining
+        # time from the snapshot and server_time
+        return jsonify({
+            'timer': cached_active_timer(current_user_id),
+            'server_time': datetime.utcnow()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get active timer', 'details': str(e)}), 500
+
+@hook_bp.route('/timers/stream', methods=['GET'])
+@jwt_required()
+def stream_timer():
+    """Server-Sent Events stream of the user's timer state.
+
+    The first event is the current timer; later events follow every start,
+    pause, resume, completion and cancellation. Streams close after
+    TIMER_STREAM_MAX_SECONDS and clients reconnect.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        hub = current_app.extensions['timer_events']
+        heartbeat = current_app.config['TIMER_STREAM_HEARTBEAT']
+        deadline = time.monotonic() + current_app.config['TIMER_STREAM_MAX_SECONDS']
+        
+        # Subscribe before reading the snapshot so no change is missed
+        subscription = hub.subscribe(current_user_id)
+        snapshot = {
+            'user_id': current_user_id,
+            'event': 'snapshot',
+            'timer': cached_active_timer(current_user_id),
+            'server_time': datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        return jsonify({'error': 'Failed to open timer stream', 'details': str(e)}), 500
+    
+    def generate():
+        try:
+            yield b'retry: 5000\n\n'
+            yield format_event(snapshot)
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield b': keepalive\n\n'
+                else:
+                    yield format_event(message)
+        finally:
+            hub.unsubscribe(subscription)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@hook_bp.route('/timers/start', methods=['POST'])
+@jwt_required()
+def start_timer():
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        if not data.get('task_name') or not data.get('duration'):
+            return jsonify({'error': 'Task name and duration are required'}), 400
+        
+        # Create new timer
+        started_at = datetime.utcnow()
+        timer_data = {
+            'user_id': ObjectId(current_user_id),
+            'task_name': data['task_name'],
+            'duration': int(data['duration']),  # in minutes
+            'category': data.get('category', 'general'),
+            'timer_type': data.get('timer_type', 'work'),  # work or break
+            'status': 'active',
+            'started_at': started_at,
+            'expected_end_at': started_at + timedelta(minutes=int(data['duration'])),
+            'paused_at': None,
+            'completed_at': None,
+            'total_paused_time': 0,
+            'mood_rating': None,
+            'notes': ''
+        }
+        
+        # The unique user_id index allows one running timer per user
+        try:
+            result = current_app.mongo.db.active_timers.insert_one(timer_data)
+        except DuplicateKeyError:
+            return jsonify({'error': 'You already have an active timer. Please complete or cancel it first.'}), 409
+        timer_data['_id'] = result.inserted_id
+        publish_timer(current_user_id, 'started', timer_data)
+        
+        timer = Timer(timer_data)
+        
+        return jsonify({
+            'message': 'Timer started successfully',
+            'timer': timer.to_dict()
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to start timer', 'details': str(e)}), 500
+
+@hook_bp.route('/timers/pause', methods=['POST'])
+@jwt_required()
+def pause_timer():
+    try:
+        current_user_id = get_jwt_identity()
+        current_time = datetime.utcnow()
+        
+        # Toggle between active and paused in one atomic update. All
+        # expressions read the stored state, so the paused time is added
+        # exactly once per resume. Resuming also pushes back the expected
+        # end used by the expiry sweep.
+        is_active = {'$eq': ['$status', 'active']}
+        paused_ms = {'$subtract': [current_time, '$paused_at']}
+        updated_timer_data = current_app.mongo.db.active_timers.find_one_and_update(
+            {'user_id': ObjectId(current_user_id), 'status': {'$in': ['active', 'paused']}},
+            [{'$set': {
+                'status': {'$cond': [is_active, 'paused', 'active']},
+                'paused_at': {'$cond': [is_active, current_time, None]},
+                'total_paused_time': {'$cond': [
+                    is_active,
+                    '$total_paused_time',
+                    {'$add': ['$total_paused_time', {'$divide': [paused_ms, 1000]}]}
+                ]},
+                'expected_end_at': {'$cond': [
+                    is_active,
+                    '$expected_end_at',
+                    {'$add': ['$expected_end_at', paused_ms]}
+                ]}
+            }}],
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if not updated_timer_data:
+            return jsonify({'error': 'No active timer found'}), 404
+        
+        event = 'paused' if updated_timer_data['status'] == 'paused' else 'resumed'
+        message = f'Timer {event}'
+        publish_timer(current_user_id, event, updated_timer_data)
+        
+        timer = Timer(updated_timer_data)
+        
+        return jsonify({
+            'message': message,
+            'timer': timer.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to pause/resume timer', 'details': str(e)}), 500
+
+@hook_bp.route('/timers/complete', methods=['POST'])
+@jwt_required()
+def complete_timer():
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        
+        # Validate before claiming, so a bad request cannot lose the timer
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be an object'}), 400
+        mood_rating = data.get('mood_rating')
+        if mood_rating is not None and (not isinstance(mood_rating, int) or not 1 <= mood_rating <= 5):
+            return jsonify({'error': 'mood_rating must be between 1 and 5'}), 400
+        
+        # Claim the timer: of concurrent completions (double taps, retries)
+        # only one gets it back. It is removed once the task and points are
+        # written, both keyed by the timer; a completion that died first is
+        # finished by a later request or the expiry sweep.
+        current_time = datetime.utcnow()
+        timer_data = current_app.mongo.db.active_timers.find_one_and_update(
+            {'user_id': ObjectId(current_user_id), '$or': [
+                {'status': {'$in': ['active', 'paused']}},
+                {'status': 'completing', 'completing_at': {'$lt': current_time - COMPLETION_RETRY_AFTER}}
+            ]},
+            {'$set': {'status': 'completing', 'completing_at': current_time}}
+        )
+        
+        if not timer_data:
+            return jsonify({'error': 'No active timer found'}), 404
+        
+        # Calculate actual duration, up to the pause or the first claim
+        if timer_data['status'] == 'paused':
+            end = timer_data['paused_at']
+        elif timer_data['status'] == 'completing':
+            end = current_time = timer_data['completing_at']
+        else:
+            end = current_time
+        actual_duration = (end - timer_data['started_at']).total_seconds()
+        actual_duration -= timer_data.get('total_paused_time', 0)
+        actual_duration_minutes = max(1, int(actual_duration / 60))  # At least 1 minute
+        
+        # Move to completed tasks, keyed by the timer like the sweep's
+        completed_task_data = {
+            '_id': timer_data['_id'],
+            'user_id': ObjectId(current_user_id),
+            'task_name': timer_data['task_name'],
+            'planned_duration': timer_data['duration'],
+            'actual_duration': actual_duration_minutes,
+            'category': timer_data['category'],
+            'timer_type': timer_data['timer_type'],
+            'mood_rating': mood_rating,
+            'notes': data.get('notes', ''),
+            'completed_at': current_time,
+            'updated_at': current_time,
+            'started_at': timer_data['started_at']
+        }
+        
+        try:
+            current_app.mongo.db.completed_tasks.insert_one(completed_task_data)
+        except DuplicateKeyError:
+            pass  # the sweep recorded it first
+        add_tasks(current_app.mongo.db, [completed_task_data])
+        
+        # Award points (1 point per 5 minutes of focus time)
+        points_earned = max(1, actual_duration_minutes // 5)
+        
+        # Bonus points for good mood rating
+        if mood_rating and mood_rating >= 4:
+            points_earned += 2
+        
+        # Award points
+        award_points(
+            current_app.mongo.db, ObjectId(current_user_id), points_earned, 'hook',
+            f'Completed {timer_data["task_name"]} ({actual_duration_minutes} min)',
+            metadata={
+                'task_name': timer_data['task_name'],
+                'duration': actual_duration_minutes,
+                'category': timer_data['category']
+            },
+            counters={'tasks_completed': 1},
+            idempotency_key=f'timer_completed:{timer_data["_id"]}',
+            earned_at=current_time,
+            activity='productivity'
+        )
+        
+        current_app.mongo.db.active_timers.delete_one({'_id': timer_data['_id'], 'status': 'completing'})
+        publish_timer(current_user_id, 'completed')
+        
+        return jsonify({
+            'message': 'Timer completed successfully',
+            'points_earned': points_earned,
+            'actual_duration': actual_duration_minutes
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to complete timer', 'details': str(e)}), 500
+
+@hook_bp.route('/timers/cancel', methods=['POST'])
+@jwt_required()
+def cancel_timer():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Remove active timer, unless the expiry sweep has claimed it
+        timer_data = current_app.mongo.db.active_timers.find_one_and_delete({
+            'user_id': ObjectId(current_user_id),
+            'status': {'$in': ['active', 'paused']}
+        })
+        
+        if not timer_data:
+            return jsonify({'error': 'No active timer found'}), 404
+        
+        publish_timer(current_user_id, 'cancelled')
+        
+        return jsonify({'message': 'Timer cancelled successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to cancel timer', 'details': str(e)}), 500
+
+@hook_bp.route('/tasks', methods=['GET'])
+@jwt_required()
+def get_tasks():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        category = request.args.get('category')
+        days = int(request.args.get('days', 30))
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 20))
+        
+        # Build query
+        query = {'user_id': ObjectId(current_user_id)}
+        
+        if category:
+            query['category'] = category
+        
+        if days > 0:
+            start_date = datetime.utcnow() - timedelta(days=days)
+            query['completed_at'] = {'$gte': start_date}
+        
+        # Get tasks with pagination
+        skip = (page - 1) * limit
+        tasks_cursor = current_app.mongo.db.completed_tasks.find(query).sort('completed_at', -1).skip(skip).limit(limit)
+        tasks = list(tasks_cursor)
+        
+        # Get total count
+        total_count = current_app.mongo.db.completed_tasks.count_documents(query)
+        
+        return jsonify({
+            'tasks': tasks,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total_count,
+                'pages': (total_count + limit - 1) // limit
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get tasks', 'details': str(e)}), 500
+
+@hook_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get date range
+        days = int(request.args.get('days', 30))
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        # Daily buckets cover the last 7 days whatever the range
+        today = datetime.utcnow().date()
+        week_start = datetime.combine(today - timedelta(days=6), datetime.min.time())
+        
+        if buckets_enabled():
+            # One pass over the user's day buckets; ranges are whole days
+            in_range = {'$match': {'day': {'$gte': bucket_day(start_date)}}}
+            duration = {'$ifNull': ['$events.actual_duration', 0]}
+            result = list(current_app.mongo.db.task_buckets.aggregate([
+                {'$match': {
+                    'user_id': ObjectId(current_user_id),
+                    'day': {'$gte': min(bucket_day(start_date), week_start)}
+                }},
+                {'$facet': {
+                    'totals': [
+                        in_range,
+                        {'$group': {'_id': None, 'tasks': {'$sum': '$tasks'}, 'time': {'$sum': '$focus_minutes'}}}
+                    ],
+                    'categories': [
+                        in_range,
+                        {'$unwind': '$events'},
+                        {'$group': {
+                            '_id': {'$ifNull': ['$events.category', 'general']},
+                            'count': {'$sum': 1},
+                            'time': {'$sum': duration}
+                        }}
+                    ],
+                    'daily': [
+                        {'$match': {'day': {'$gte': week_start}}},
+                        {'$project': {
+                            '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$day'}},
+                            'tasks': '$tasks',
+                            'time': '$focus_minutes'
+                        }}
+                    ],
+                    'recent': [
+                        in_range,
+                        {'$sort': {'day': -1}},
+                        {'$limit': 10},
+                        {'$unwind': '$events'},
+                        {'$sort': {'events.completed_at': -1}},
+                        {'$limit': 10},
+                        {'$replaceRoot': {'newRoot': {'$mergeObjects': [{'user_id': '$user_id'}, '$events']}}}
+                    ]
+                }}
+            ]))[0]
+        else:
+            # One pass over the (user_id, completed_at) index
+            in_range = {'$match': {'completed_at': {'$gte': start_date}}}
+            duration = {'$ifNull': ['$actual_duration', 0]}
+            result = list(current_app.mongo.db.completed_tasks.aggregate([
+                {'$match': {
+                    'user_id': ObjectId(current_user_id),
+                    'completed_at': {'$gte': min(start_date, week_start)}
+                }},
+                {'$facet': {
+                    'totals': [
+                        in_range,
+                        {'$group': {'_id': None, 'tasks': {'$sum': 1}, 'time': {'$sum': duration}}}
+                    ],
+                    'categories': [
+                        in_range,
+                        {'$group': {
+                            '_id': {'$ifNull': ['$category', 'general']},
+                            'count': {'$sum': 1},
+                            'time': {'$sum': duration}
+                        }}
+                    ],
+                    'daily': [
+                        {'$match': {'completed_at': {'$gte': week_start}}},
+                        {'$group': {
+                            '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$completed_at'}},
+                            'tasks': {'$sum': 1},
+                            'time': {'$sum': duration}
+                        }}
+                    ],
+                    'recent': [
+                        in_range,
+                        {'$sort': {'completed_at': -1}},
+                        {'$limit': 10}
+                    ]
+                }}
+            ]))[0]
+        
+        # Calculate statistics
+        totals = result['totals'][0] if result['totals'] else {'tasks': 0, 'time': 0}
+        total_tasks = totals['tasks']
+        total_time = totals['time']
+        avg_session_length = total_time / max(1, total_tasks)
+        
+        # Productivity streak is maintained on the user
+        user_data = current_app.mongo.db.users.find_one({'_id': ObjectId(current_user_id)}, {'stats': 1})
+        productivity_streak = current_streak((user_data or {}).get('stats', {}), 'productivity')
+        
+        # Category breakdown
+        category_stats = {
+            row['_id']: {'count': row['count'], 'time': row['time']}
+            for row in result['categories']
+        }
+        
+        # Daily productivity (last 7 days, oldest to newest)
+        daily = {row['_id']: row for row in result['daily']}
+        daily_productivity = []
+        for i in range(6, -1, -1):
+            date = (today - timedelta(days=i)).isoformat()
+            day = daily.get(date, {})
+            daily_productivity.append({
+                'date': date,
+                'tasks': day.get('tasks', 0),
+                'time': day.get('time', 0)
+            })
+        
+        return jsonify({
+            'total_tasks': total_tasks,
+            'total_time': total_time,
+            'avg_session_length': avg_session_length,
+            'productivity_streak': productivity_streak,
+            'category_stats': category_stats,
+            'daily_productivity': daily_productivity,
+            'recent_tasks': result['recent']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get analytics', 'details': str(e)}), 500
+
+@hook_bp.route('/presets', methods=['GET'])
+@jwt_required()
+def get_presets():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get user preferences
+        user_data = current_app.mongo.db.users.find_one({'_id': ObjectId(current_user_id)})
+        
+        if not user_data:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Default presets
+        default_presets = [
+            {'name': 'Pomodoro', 'duration': 25, 'type': 'work', 'category': 'general', 'color': 'red'},
+            {'name': 'Short Break', 'duration': 5, 'type': 'break', 'category': 'break', 'color': 'orange'},
+            {'name': 'Long Break', 'duration': 15, 'type': 'break', 'category': 'break', 'color': 'green'},
+            {'name': 'Deep Work', 'duration': 90, 'type': 'work', 'category': 'work', 'color': 'blue'},
+            {'name': 'Quick Task', 'duration': 10, 'type': 'work', 'category': 'general', 'color': 'purple'}
+        ]
+        
+        # User custom presets
+        custom_presets = user_data.get('preferences', {}).get('timer_presets', [])
+        
+        return jsonify({
+            'default_presets': default_presets,
+            'custom_presets': custom_presets
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get presets', 'details': str(e)}), 500
+
+@hook_bp.route('/presets', methods=['POST'])
+@jwt_required()
+def save_preset():
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        required_fields = ['name', 'duration', 'type', 'category']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+        
+        # Create preset
+        preset = {
+            'name': data['name'],
+            'duration': int(data['duration']),
+            'type': data['type'],
+            'category': data['category'],
+            'color': data.get('color', 'blue')
+        }
+        
+        # Add to user preferences
+        current_app.mongo.db.users.update_one(
+            {'_id': ObjectId(current_user_id)},
+            {'$push': {'preferences.timer_presets': preset}}
+        )
+        
+        return jsonify({
+            'message': 'Preset saved successfully',
+            'preset': preset
+        }), 201
+        
+    except Exception as e:
         return jsonify({'error': 'Failed to save preset', 'details': str(e)}), 500
\ No newline at end of file
@@ -1,546 +1,871 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from bson import ObjectId
-from datetime import datetime
-import requests
-from models import Book, Reward
-
-nook_bp = Blueprint('nook', __name__)
-
-def search_google_books(query, max_results=10):
-    """Search Google Books API"""
-    try:
-        api_key = current_app.config.get('GOOGLE_BOOKS_API_KEY')
-        url = f"https://www.googleapis.com/books/v1/volumes"
-        params = {
-            'q': query,
-            'maxResults': max_results,
-            'key': api_key
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        books = []
-        
-        for item in data.get('items', []):
-            volume_info = item.get('volumeInfo', {})
-            books.append({
-                'google_id': item.get('id'),
-                'title': volume_info.get('title', ''),
-                'authors': volume_info.get('authors', []),
-                'description': volume_info.get('description', ''),
-                'page_count': volume_info.get('pageCount', 0),
-                'cover_image': volume_info.get('imageLinks', {}).get('thumbnail', ''),
-                'genre': ', '.join(volume_info.get('categories', [])),
-                'isbn': next((identifier['identifier'] for identifier in volume_info.get('industryIdentifiers', []) 
-                            if identifier['type'] in ['ISBN_13', 'ISBN_10']), ''),
-                'published_date': volume_info.get('publishedDate', '')
-            })
-        
-        return books
-    except Exception as e:
-        return []
-
-@nook_bp.route('/books', methods=['GET'])
-@jwt_required()
-def get_books():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get query parameters
-        status = request.args.get('status')  # to_read, reading, finished
-        genre = request.args.get('genre')
-        sort_by = request.args.get('sort_by', 'added_at')  # added_at, title, progress
-        order = request.args.get('order', 'desc')  # asc, desc
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        
-        # Build query
-        query = {'user_id': ObjectId(current_user_id)}
-        
-        if status:
-            query['status'] = status
-        
-        if genre:
-            query['genre'] = {'$regex': genre, '$options': 'i'}
-        
-        # Build sort
-        sort_direction = 1 if order == 'asc' else -1
-        sort_field = sort_by
-        
-        # Get books with pagination
-        skip = (page - 1) * limit
-        books_cursor = current_app.mongo.db.books.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
-        books = [Book(book_data).to_dict() for book_data in books_cursor]
-        
-        # Get total count
-        total_count = current_app.mongo.db.books.count_documents(query)
-        
-        # Calculate stats
-        stats = {
-            'total_books': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id)}),
-            'to_read': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'to_read'}),
-            'reading': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'reading'}),
-            'finished': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'finished'})
-        }
-        
-        return jsonify({
-            'books': books,
-            'stats': stats,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total_count,
-                'pages': (total_count + limit - 1) // limit
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get books', 'details': str(e)}), 500
-
-@nook_bp.route('/books/<book_id>', methods=['GET'])
-@jwt_required()
-def get_book(book_id):
-    try:
-        current_user_id = get_jwt_identity()
-        
-        book_data = current_app.mongo.db.books.find_one({
-            '_id': ObjectId(book_id),
-            'user_id': ObjectId(current_user_id)
-        })
-        
-        if not book_data:
-            return jsonify({'error': 'Book not found'}), 404
-        
-        book = Book(book_data)
-        
-        # Get reading sessions for this book
-        sessions = list(current_app.mongo.db.reading_sessions.find({
-            'user_id': ObjectId(current_user_id),
-            'book_id': ObjectId(book_id)
-        }).sort('date', -1).limit(10))
-        
-        return jsonify({
-            'book': book.to_dict(),
-            'recent_sessions': sessions
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to get book', 'details': str(e)}), 500
-
-@nook_bp.route('/books', methods=['POST'])
-@jwt_required()
-def add_book():
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data.get('title'):
-            return jsonify({'error': 'Title is required'}), 400
-        
-        # Create book data
-        book_data = {
-            'user_id': ObjectId(current_user_id),
-            'title': data['title'],
-            'authors': data.get('authors', []),
-            'description': data.get('description', ''),
-            'page_count': data.get('page_count', 0),
-            'current_page': data.get('current_page', 0),
-            'status': data.get('status', 'to_read'),
-            'rating': 0,
-            'cover_image': data.get('cover_image', ''),
-            'genre': data.get('genre', ''),
-            'isbn': data.get('isbn', ''),
-            'published_date': data.get('published_date', ''),
-            'added_at': datetime.utcnow(),
-            'quotes': [],
-            'takeaways': []
-        }
-        
-        # Insert book
-        result = current_app.mongo.db.books.insert_one(book_data)
-        book_data['_id'] = result.inserted_id
-        
-        # Award points for adding a book
-        reward_data = {
-            'user_id': ObjectId(current_user_id),
-            'points': 5,
-            'source': 'nook',
-            'description': f'Added book: {data["title"]}',
-            'earned_at': datetime.utcnow(),
-            'metadata': {'book_id': str(result.inserted_id)}
-        }
-        
-        current_app.mongo.db.rewards.insert_one(reward_data)
-        
-        # Update user points
-        current_app.mongo.db.users.update_one(
-            {'_id': ObjectId(current_user_id)},
-            {'$inc': {'points': 5}}
-        )
-        
-        book = Book(book_data)
-        
-        return jsonify({
-            'message': 'Book added successfully',
-            'book': book.to_dict()
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to add book', 'details': str(e)}), 500
-
-@nook_bp.route('/books/<book_id>', methods=['PUT'])
-@jwt_required()
-def update_book(book_id):
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Check if book exists and belongs to user
-        book_data = current_app.mongo.db.books.find_one({
-            '_id': ObjectId(book_id),
-            'user_id': ObjectId(current_user_id)
-        })
-        
-        if not book_data:
-            return jsonify({'error': 'Book not found'}), 404
-        
-        # Allowed fields to update
-        allowed_fields = [
-            'title', 'authors', 'description', 'page_count', 
-            'status', 'rating', 'genre', 'isbn'
-        ]
-        
-        update_data = {}
-        for field in allowed_fields:
-            if field in data:
-                update_data[field] = data[field]
-        
-        if not update_data:
-            return jsonify({'error': 'No valid fields to update'}), 400
-        
-        # Check if book is being marked as finished
-        if data.get('status') == 'finished' and book_data['status'] != 'finished':
-            update_data['finished_at'] = datetime.utcnow()
-            
-            # Award completion points
-            reward_data = {
-                'user_id': ObjectId(current_user_id),
-                'points': 50,
-                'source': 'nook',
-                'description': f'Finished reading: {book_data["title"]}',
-                'earned_at': datetime.utcnow(),
-                'metadata': {'book_id': book_id}
-            }
-            
-            current_app.mongo.db.rewards.insert_one(reward_data)
-            current_app.mongo.db.users.update_one(
-                {'_id': ObjectId(current_user_id)},
-                {'$inc': {'points': 50}}
-            )
-        
-        # Update book
-        current_app.mongo.db.books.update_one(
-            {'_id': ObjectId(book_id)},
-            {'$set': update_data}
-        )
-        
-        # Get updated book
-        updated_book_data = current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)})
-        book = Book(updated_book_data)
-        
-        return jsonify({
-            'message': 'Book updated successfully',
-            'book': book.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to update book', 'details': str(e)}), 500
-
-@nook_bp.route('/books/<book_id>/progress', methods=['POST'])
-@jwt_required()
-def update_progress(book_id):
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        if 'current_page' not in data:
-            return jsonify({'error': 'Current page is required'}), 400
-        
-        current_page = data['current_page']
-        
-        # Get book
-        book_data = current_app.mongo.db.books.find_one({
-            '_id': ObjectId(book_id),
-            'user_id': ObjectId(current_user_id)
-        })
-        
-        if not book_data:
-            return jsonify({'error': 'Book not found'}), 404
-        
-        # Calculate pages read in this session
-        pages_read = max(0, current_page - book_data.get('current_page', 0))
-        
-        # Update book progress
-        update_data = {'current_page': current_page}
-        
-        # Auto-update status based on progress
-        if current_page > 0 and book_data['status'] == 'to_read':
-            update_data['status'] = 'reading'
-        elif current_page >= book_data.get('page_count', 0) and book_data['status'] != 'finished':
-            update_data['status'] = 'finished'
-            update_data['finished_at'] = datetime.utcnow()
-        
-        current_app.mongo.db.books.update_one(
-            {'_id': ObjectId(book_id)},
-            {'$set': update_data}
-        )
-        
-        # Create reading session
-        session_data = {
-            'user_id': ObjectId(current_user_id),
-            'book_id': ObjectId(book_id),
-            'pages_read': pages_read,
-            'current_page': current_page,
-            'duration_minutes': data.get('duration_minutes', 0),
-            'notes': data.get('session_notes', ''),
-            'date': datetime.utcnow()
-        }
-        
-        current_app.mongo.db.reading_sessions.insert_one(session_data)
-        
-        # Award points for reading (1 point per page, max 20 per session)
-        points_earned = min(pages_read, 20)
-        if points_earned > 0:
-            reward_data = {
-                'user_id': ObjectId(current_user_id),
-                'points': points_earned,
-                'source': 'nook',
-                'description': f'Read {pages_read} pages in {book_data["title"]}',
-                'earned_at': datetime.utcnow(),
-                'metadata': {'book_id': book_id, 'pages_read': pages_read}
-            }
-            
-            current_app.mongo.db.rewards.insert_one(reward_data)
-            current_app.mongo.db.users.update_one(
-                {'_id': ObjectId(current_user_id)},
-                {'$inc': {'points': points_earned}}
-            )
-        
-        # Get updated book
-        updated_book_data = current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)})
-        book = Book(updated_book_data)
-        
-        return jsonify({
-            'message': 'Progress updated successfully',
-            'book': book.to_dict(),
-            'points_earned': points_earned
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to update progress', 'details': str(e)}), 500
-
-@nook_bp.route('/books/<book_id>/quotes', methods=['POST'])
-@jwt_required()
-def add_quote(book_id):
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data.get('text'):
-            return jsonify({'error': 'Quote text is required'}), 400
-        
-        # Check if book exists and belongs to user
-        book_data = current_app.mongo.db.books.find_one({
-            '_id': ObjectId(book_id),
-            'user_id': ObjectId(current_user_id)
-        })
-        
-        if not book_data:
-            return jsonify({'error': 'Book not found'}), 404
-        
-        # Create quote
-        quote_data = {
-            'text': data['text'],
-            'page': data.get('page', ''),
-            'context': data.get('context', ''),
-            'added_at': datetime.utcnow()
-        }
-        
-        # Add quote to book
-        current_app.mongo.db.books.update_one(
-            {'_id': ObjectId(book_id)},
-            {'$push': {'quotes': quote_data}}
-        )
-        
-        # Award points for adding quote
-        reward_data = {
-            'user_id': ObjectId(current_user_id),
-            'points': 3,
-            'source': 'nook',
-            'description': f'Added quote from {book_data["title"]}',
-            'earned_at': datetime.utcnow(),
-            'metadata': {'book_id': book_id}
-        }
-        
-        current_app.mongo.db.rewards.insert_one(reward_data)
-        current_app.mongo.db.users.update_one(
-            {'_id': ObjectId(current_user_id)},
-            {'$inc': {'points': 3}}
-        )
-        
-        return jsonify({
-            'message': 'Quote added successfully',
-            'quote': quote_data
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to add quote', 'details': str(e)}), 500
-
-@nook_bp.route('/books/<book_id>/takeaways', methods=['POST'])
-@jwt_required()
-def add_takeaway(book_id):
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data.get('takeaway'):
-            return jsonify({'error': 'Takeaway text is required'}), 400
-        
-        # Check if book exists and belongs to user
-        book_data = current_app.mongo.db.books.find_one({
-            '_id': ObjectId(book_id),
-            'user_id': ObjectId(current_user_id)
-        })
-        
-        if not book_data:
-            return jsonify({'error': 'Book not found'}), 404
-        
-        # Create takeaway
-        takeaway_data = {
-            'takeaway': data['takeaway'],
-            'page_reference': data.get('page_reference', ''),
-            'added_at': datetime.utcnow()
-        }
-        
-        # Add takeaway to book
-        current_app.mongo.db.books.update_one(
-            {'_id': ObjectId(book_id)},
-            {'$push': {'takeaways': takeaway_data}}
-        )
-        
-        # Award points for adding takeaway
-        reward_data = {
-            'user_id': ObjectId(current_user_id),
-            'points': 2,
-            'source': 'nook',
-            'description': f'Added takeaway from {book_data["title"]}',
-            'earned_at': datetime.utcnow(),
-            'metadata': {'book_id': book_id}
-        }
-        
-        current_app.mongo.db.rewards.insert_one(reward_data)
-        current_app.mongo.db.users.update_one(
-            {'_id': ObjectId(current_user_id)},
-            {'$inc': {'points': 2}}
-        )
-        
-        return jsonify({
-            'message': 'Takeaway added successfully',
-            'takeaway': takeaway_data
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': 'Failed to add takeaway', 'details': str(e)}), 500
-
-@nook_bp.route('/search', methods=['GET'])
-@jwt_required()
-def search_books():
-    try:
-        query = request.args.get('q', '').strip()
-        
-        if not query:
-            return jsonify({'error': 'Search query is required'}), 400
-        
-        # Search Google Books
-        books = search_google_books(query)
-        
-        return jsonify({
-            'books': books,
-            'total': len(books)
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': 'Search failed', 'details': str(e)}), 500
-
-@nook_bp.route('/analytics', methods=['GET'])
-@jwt_required()
-def get_analytics():
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get date range
-        days = int(request.args.get('days', 30))
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Reading statistics
-        total_books = current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id)})
-        finished_books = current_app.mongo.db.books.count_documents({
-            'user_id': ObjectId(current_user_id),
-            'status': 'finished'
-        })
-        
-        # Reading sessions in date range
-        sessions = list(current_app.mongo.db.reading_sessions.find({
-            'user_id': ObjectId(current_user_id),
-            'date': {'$gte': start_date}
-        }))
-        
-        total_pages_read = sum(session.get('pages_read', 0) for session in sessions)
-        total_reading_time = sum(session.get('duration_minutes', 0) for session in sessions)
-        
-        # Calculate reading streak
-        reading_streak = 0
-        current_date = datetime.utcnow().date()
-        
-        while True:
-            day_sessions = current_app.mongo.db.reading_sessions.count_documents({
-                'user_id': ObjectId(current_user_id),
-                'date': {
-                    '$gte': datetime.combine(current_date, datetime.min.time()),
-                    '$lt': datetime.combine(current_date + timedelta(days=1), datetime.min.time())
-                }
-            })
-            
-            if day_sessions > 0:
-                reading_streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                break
-        
-        # Genre distribution
-        books_by_genre = list(current_app.mongo.db.books.aggregate([
-            {'$match': {'user_id': ObjectId(current_user_id)}},
-            {'$group': {'_id': '$genre', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ]))
-        
-        return jsonify({
-            'total_books': total_books,
-            'finished_books': finished_books,
-            'total_pages_read': total_pages_read,
-            'total_reading_time': total_reading_time,
-            'reading_streak': reading_streak,
-            'average_pages_per_session': total_pages_read / max(1, len(sessions)),
-            'books_by_genre': books_by_genre,
-            'recent_sessions': sessions[-10:] if sessions else []
-        }), 200
-        
-    except Exception as e:
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import csv
+import os
+import tempfile
+import threading
+import requests
+from models import Book, Reward
+from activity_buckets import bucket_day, buckets_enabled, update_session
+from change_tracking import record_deletions
+from points import award_points, update_counters
+from reading_sessions import record_progress
+from streaks import current_streak
+
+nook_bp = Blueprint('nook', __name__)
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ROWS = 20000
+IMPORT_POINTS_PER_BOOK = 5
+
+# Goodreads "Exclusive Shelf" values mapped to book status
+IMPORT_SHELVES = {
+    'read': 'finished',
+    'currently-reading': 'reading',
+    'to-read': 'to_read'
+}
+
+# Analytics weekday names, in $isoDayOfWeek order (1 = Monday)
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+def search_google_books(query, max_results=10):
+    """Search Google Books API"""
+    try:
+        api_key = current_app.config.get('GOOGLE_BOOKS_API_KEY')
+        url = f"https://www.googleapis.com/books/v1/volumes"
+        params = {
+            'q': query,
+            'maxResults': max_results,
+            'key': api_key
+        }
+        
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        
+        data = response.json()
+        books = []
+        
+        for item in data.get('items', []):
+            volume_info = item.get('volumeInfo', {})
+            books.append({
+                'google_id': item.get('id'),
+                'title': volume_info.get('title', ''),
+                'authors': volume_info.get('authors', []),
+                'description': volume_info.get('description', ''),
+                'page_count': volume_info.get('pageCount', 0),
+                'cover_image': volume_info.get('imageLinks', {}).get('thumbnail', ''),
+                'genre': ', '.join(volume_info.get('categories', [])),
+                'isbn': next((identifier['identifier'] for identifier in volume_info.get('industryIdentifiers', []) 
+                            if identifier['type'] in ['ISBN_13', 'ISBN_10']), ''),
+                'published_date': volume_info.get('publishedDate', '')
+            })
+        
+        return books
+    except Exception as e:
+        return []
+
+@nook_bp.route('/books', methods=['GET'])
+@jwt_required()
+def get_books():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        status = request.args.get('status')  # to_read, reading, finished
+        genre = request.args.get('genre')
+        sort_by = request.args.get('sort_by', 'added_at')  # added_at, title, progress
+        order = request.args.get('order', 'desc')  # asc, desc
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 20))
+        
+        # Build query
+        query = {'user_id': ObjectId(current_user_id)}
+        
+        if status:
+            query['status'] = status
+        
+        if genre:
+            query['genre'] = {'$regex': genre, '$options': 'i'}
+        
+        # Build sort
+        sort_direction = 1 if order == 'asc' else -1
+        sort_field = sort_by
+        
+        # Get books with pagination
+        skip = (page - 1) * limit
+        books_cursor = current_app.mongo.db.books.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
+        books = Book.serialize_many(books_cursor)
+        
+        # Get total count
+        total_count = current_app.mongo.db.books.count_documents(query)
+        
+        # Calculate stats
+        stats = {
+            'total_books': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id)}),
+            'to_read': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'to_read'}),
+            'reading': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'reading'}),
+            'finished': current_app.mongo.db.books.count_documents({'user_id': ObjectId(current_user_id), 'status': 'finished'})
+        }
+        
+        return jsonify({
+            'books': books,
+            'stats': stats,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total_count,
+                'pages': (total_count + limit - 1) // limit
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get books', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>', methods=['GET'])
+@jwt_required()
+def get_book(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        
+        book_data = current_app.mongo.db.books.find_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not book_data:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        book = Book(book_data)
+        
+        # Get reading sessions for this book
+        sessions = list(current_app.mongo.db.reading_sessions.find({
+            'user_id': ObjectId(current_user_id),
+            'book_id': ObjectId(book_id)
+        }).sort('date', -1).limit(10))
+        
+        return jsonify({
+            'book': book.to_dict(),
+            'recent_sessions': sessions
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get book', 'details': str(e)}), 500
+
+@nook_bp.route('/books', methods=['POST'])
+@jwt_required()
+def add_book():
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        if not data.get('title'):
+            return jsonify({'error': 'Title is required'}), 400
+        
+        # Create book data
+        book_data = {
+            'user_id': ObjectId(current_user_id),
+            'title': data['title'],
+            'authors': data.get('authors', []),
+            'description': data.get('description', ''),
+            'page_count': data.get('page_count', 0),
+            'current_page': data.get('current_page', 0),
+            'status': data.get('status', 'to_read'),
+            'rating': 0,
+            'cover_image': data.get('cover_image', ''),
+            'genre': data.get('genre', ''),
+            'isbn': data.get('isbn', ''),
+            'published_date': data.get('published_date', ''),
+            'added_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'quotes': [],
+            'takeaways': []
+        }
+        
+        # Insert book
+        result = current_app.mongo.db.books.insert_one(book_data)
+        book_data['_id'] = result.inserted_id
+        
+        # Award points for adding a book
+        award_points(
+            current_app.mongo.db, ObjectId(current_user_id), 5, 'nook',
+            f'Added book: {data["title"]}',
+            metadata={'book_id': str(result.inserted_id)},
+            counters={'books_added': 1},
+            idempotency_key=f'book_added:{result.inserted_id}'
+        )
+        
+        book = Book(book_data)
+        
+        return jsonify({
+            'message': 'Book added successfully',
+            'book': book.to_dict()
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to add book', 'details': str(e)}), 500
+
+def _clean_isbn(value):
+    """Strip Goodreads' ="..." wrapping and any separators from an ISBN"""
+    return ''.join(ch for ch in (value or '') if ch.isdigit() or ch in 'Xx').upper()
+
+def _parse_import_date(value):
+    for date_format in ('%Y/%m/%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value.strip(), date_format)
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+def parse_import_row(row, user_id, imported_at):
+    """Build a book document from a Goodreads export or generic CSV row.
+
+    Column names are matched case-insensitively. Returns None for rows
+    without a title.
+    """
+    row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+    
+    title = row.get('title')
+    if not title:
+        return None
+    
+    authors = [row.get('author') or row.get('authors', '')]
+    authors += row.get('additional authors', '').split(',')
+    authors = [author.strip() for author in authors if author.strip()]
+    
+    shelf = row.get('exclusive shelf') or row.get('status', '')
+    status = IMPORT_SHELVES.get(shelf, shelf if shelf in ('to_read', 'reading', 'finished') else 'to_read')
+    
+    try:
+        page_count = int(row.get('number of pages') or row.get('page_count') or 0)
+    except ValueError:
+        page_count = 0
+    
+    try:
+        rating = int(float(row.get('my rating') or row.get('rating') or 0))
+    except ValueError:
+        rating = 0
+    
+    book_data = {
+        'user_id': user_id,
+        'title': title,
+        'authors': authors,
+        'description': '',
+        'page_count': page_count,
+        'current_page': page_count if status == 'finished' else 0,
+        'status': status,
+        'rating': rating,
+        'cover_image': '',
+        'genre': row.get('genre', ''),
+        'isbn': _clean_isbn(row.get('isbn13')) or _clean_isbn(row.get('isbn')),
+        'published_date': row.get('year published') or row.get('published_date', ''),
+        'added_at': _parse_import_date(row.get('date added', '')) or imported_at,
+        'updated_at': imported_at,
+        'quotes': [],
+        'takeaways': [],
+        'imported': True
+    }
+    
+    if status == 'finished':
+        book_data['finished_at'] = _parse_import_date(row.get('date read', '')) or imported_at
+    
+    return book_data
+
+def import_books(db, job_id, user_id, csv_file):
+    """Upsert books from a CSV file in bulk, recording progress on the job.
+
+    Books are deduplicated on ISBN (or title when there is no ISBN), both
+    within the file and against the user's existing library. Points for all
+    imported books are recorded as one reward entry and one $inc.
+    """
+    imported_at = datetime.utcnow()
+    progress = {'processed': 0, 'imported': 0, 'duplicates': 0, 'skipped': 0, 'finished': 0}
+    seen = set()
+    operations = []
+    
+    def flush():
+        if operations:
+            result = db.books.bulk_write(operations, ordered=False)
+            progress['imported'] += result.upserted_count
+            progress['duplicates'] += len(operations) - result.upserted_count
+            progress['finished'] += sum(
+                1 for index in result.upserted_ids
+                if operations[index]._doc['$setOnInsert']['status'] == 'finished'
+            )
+            operations.clear()
+        db.import_jobs.update_one({'_id': job_id}, {'$set': progress})
+    
+    for row in csv.DictReader(csv_file):
+        progress['processed'] += 1
+        if progress['processed'] > IMPORT_MAX_ROWS:
+            progress['processed'] -= 1
+            progress['truncated'] = True
+            break
+        
+        book_data = parse_import_row(row, user_id, imported_at)
+        if not book_data:
+            progress['skipped'] += 1
+            continue
+        
+        key = book_data['isbn'] or book_data['title'].lower()
+        if key in seen:
+            progress['duplicates'] += 1
+            continue
+        seen.add(key)
+        
+        book_filter = {'user_id': user_id}
+        if book_data['isbn']:
+            book_filter['isbn'] = book_data['isbn']
+        else:
+            book_filter['title'] = book_data['title']
+        
+        operations.append(UpdateOne(book_filter, {'$setOnInsert': book_data}, upsert=True))
+        if len(operations) >= IMPORT_BATCH_SIZE:
+            flush()
+    
+    flush()
+    
+    # One aggregated reward for the whole import
+    points_earned = progress['imported'] * IMPORT_POINTS_PER_BOOK
+    if points_earned > 0:
+        award_points(
+            db, user_id, points_earned, 'nook',
+            f"Imported {progress['imported']} books",
+            metadata={'import_job_id': str(job_id), 'books_imported': progress['imported']},
+            counters={'books_added': progress['imported'], 'books_finished': progress['finished']},
+            idempotency_key=f'book_import:{job_id}'
+        )
+    
+    progress['points_earned'] = points_earned
+    return progress
+
+def run_import_job(app, job_id, user_id, path):
+    """Background thread entry point for a library import"""
+    with app.app_context():
+        db = app.mongo.db
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as csv_file:
+                progress = import_books(db, job_id, user_id, csv_file)
+            db.import_jobs.update_one(
+                {'_id': job_id},
+                {'$set': dict(progress, status='completed', finished_at=datetime.utcnow())}
+            )
+        except Exception as e:
+            db.import_jobs.update_one(
+                {'_id': job_id},
+                {'$set': {'status': 'failed', 'error': str(e), 'finished_at': datetime.utcnow()}}
+            )
+        finally:
+            os.remove(path)
+
+@nook_bp.route('/books/import', methods=['POST'])
+@jwt_required()
+def start_book_import():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Accept a multipart upload ("file") or a raw text/csv body
+        upload = request.files.get('file')
+        if not upload and request.mimetype != 'text/csv':
+            return jsonify({'error': 'A CSV file is required'}), 400
+        
+        # Spool the upload to disk so the import can outlive the request
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            source = upload.stream if upload else request.stream
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                f.write(chunk)
+        
+        job_data = {
+            'user_id': ObjectId(current_user_id),
+            'type': 'book_import',
+            'status': 'processing',
+            'filename': upload.filename if upload else None,
+            'processed': 0,
+            'imported': 0,
+            'duplicates': 0,
+            'skipped': 0,
+            'created_at': datetime.utcnow()
+        }
+        
+        result = current_app.mongo.db.import_jobs.insert_one(job_data)
+        job_data['_id'] = result.inserted_id
+        
+        threading.Thread(
+            target=run_import_job,
+            args=(current_app._get_current_object(), result.inserted_id, ObjectId(current_user_id), path),
+            daemon=True
+        ).start()
+        
+        return jsonify({
+            'message': 'Import started',
+            'job': job_data
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to start import', 'details': str(e)}), 500
+
+@nook_bp.route('/books/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_book_import(job_id):
+    try:
+        current_user_id = get_jwt_identity()
+        
+        job = current_app.mongo.db.import_jobs.find_one({
+            '_id': ObjectId(job_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not job:
+            return jsonify({'error': 'Import job not found'}), 404
+        
+        return jsonify({'job': job}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get import job', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>', methods=['PUT'])
+@jwt_required()
+def update_book(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Check if book exists and belongs to user
+        book_data = current_app.mongo.db.books.find_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not book_data:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Allowed fields to update
+        allowed_fields = [
+            'title', 'authors', 'description', 'page_count', 
+            'status', 'rating', 'genre', 'isbn'
+        ]
+        
+        update_data = {}
+        for field in allowed_fields:
+            if field in data:
+                update_data[field] = data[field]
+        
+        if not update_data:
+            return jsonify({'error': 'No valid fields to update'}), 400
+        
+        update_data['updated_at'] = datetime.utcnow()
+        
+        # Check if book is being marked as finished
+        if data.get('status') == 'finished' and book_data['status'] != 'finished':
+            update_data['finished_at'] = datetime.utcnow()
+            
+            # Award completion points
+            award_points(
+                current_app.mongo.db, ObjectId(current_user_id), 50, 'nook',
+                f'Finished reading: {book_data["title"]}',
+                metadata={'book_id': book_id},
+                counters={'books_finished': 1},
+                idempotency_key=f'book_finished:{book_id}'
+            )
+        
+        # Update book
+        current_app.mongo.db.books.update_one(
+            {'_id': ObjectId(book_id)},
+            {'$set': update_data}
+        )
+        
+        # Get updated book
+        updated_book_data = current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)})
+        book = Book(updated_book_data)
+        
+        return jsonify({
+            'message': 'Book updated successfully',
+            'book': book.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to update book', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>', methods=['DELETE'])
+@jwt_required()
+def delete_book(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        
+        result = current_app.mongo.db.books.delete_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not result.deleted_count:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Let other devices drop the book on their next sync
+        record_deletions(current_app.mongo.db, ObjectId(current_user_id), 'books', [ObjectId(book_id)])
+        
+        return jsonify({'message': 'Book deleted successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to delete book', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>/progress', methods=['POST'])
+@jwt_required()
+def update_progress(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        if 'current_page' not in data:
+            return jsonify({'error': 'Current page is required'}), 400
+        
+        current_page = data['current_page']
+        
+        # Get book
+        book_data = current_app.mongo.db.books.find_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not book_data:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Calculate pages read in this session
+        pages_read = max(0, current_page - book_data.get('current_page', 0))
+        
+        # Update book progress
+        update_data = {'current_page': current_page, 'updated_at': datetime.utcnow()}
+        
+        # Auto-update status based on progress
+        if current_page > 0 and book_data['status'] == 'to_read':
+            update_data['status'] = 'reading'
+        elif current_page >= book_data.get('page_count', 0) and book_data['status'] != 'finished':
+            update_data['status'] = 'finished'
+            update_data['finished_at'] = datetime.utcnow()
+        
+        current_app.mongo.db.books.update_one(
+            {'_id': ObjectId(book_id)},
+            {'$set': update_data}
+        )
+        
+        counters = {'books_finished': 1} if update_data.get('status') == 'finished' else {}
+        duration_minutes = data.get('duration_minutes', 0)
+        now = datetime.utcnow()
+        activities = None
+        points_earned = 0
+        
+        # Merge into the open session for this book, or start one. Autosaves
+        # without progress don't make a session.
+        if pages_read > 0 or duration_minutes:
+            session = record_progress(
+                current_app.mongo.db, ObjectId(current_user_id), ObjectId(book_id),
+                pages_read, current_page, duration_minutes, data.get('session_notes', ''),
+                window=timedelta(minutes=current_app.config['READING_SESSION_MERGE_MINUTES']),
+                now=now
+            )
+            update_session(current_app.mongo.db, session, pages_read, duration_minutes)
+            activities = [('reading', now.date())]
+            
+            # Award points for reading (1 point per page, max 20 per session)
+            points_earned = min(session['pages_read'], 20) - min(session['pages_read'] - pages_read, 20)
+        
+        if points_earned > 0:
+            award_points(
+                current_app.mongo.db, ObjectId(current_user_id), points_earned, 'nook',
+                f'Read {pages_read} pages in {book_data["title"]}',
+                metadata={'book_id': book_id, 'pages_read': pages_read},
+                counters=counters,
+                earned_at=now,
+                activity='reading'
+            )
+        else:
+            update_counters(current_app.mongo.db, ObjectId(current_user_id), counters,
+                            activities=activities)
+        
+        # Get updated book
+        updated_book_data = current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)})
+        book = Book(updated_book_data)
+        
+        return jsonify({
+            'message': 'Progress updated successfully',
+            'book': book.to_dict(),
+            'points_earned': points_earned
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to update progress', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>/quotes', methods=['POST'])
+@jwt_required()
+def add_quote(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        if not data.get('text'):
+            return jsonify({'error': 'Quote text is required'}), 400
+        
+        # Check if book exists and belongs to user
+        book_data = current_app.mongo.db.books.find_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not book_data:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Create quote
+        quote_data = {
+            'text': data['text'],
+            'page': data.get('page', ''),
+            'context': data.get('context', ''),
+            'added_at': datetime.utcnow()
+        }
+        
+        # Add quote to book
+        current_app.mongo.db.books.update_one(
+            {'_id': ObjectId(book_id)},
+            {'$push': {'quotes': quote_data}, '$set': {'updated_at': datetime.utcnow()}}
+        )
+        
+        # Award points for adding quote
+        award_points(
+            current_app.mongo.db, ObjectId(current_user_id), 3, 'nook',
+            f'Added quote from {book_data["title"]}',
+            metadata={'book_id': book_id},
+            counters={'quotes_added': 1}
+        )
+        
+        return jsonify({
+            'message': 'Quote added successfully',
+            'quote': quote_data
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to add quote', 'details': str(e)}), 500
+
+@nook_bp.route('/books/<book_id>/takeaways', methods=['POST'])
+@jwt_required()
+def add_takeaway(book_id):
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate required fields
+        if not data.get('takeaway'):
+            return jsonify({'error': 'Takeaway text is required'}), 400
+        
+        # Check if book exists and belongs to user
+        book_data = current_app.mongo.db.books.find_one({
+            '_id': ObjectId(book_id),
+            'user_id': ObjectId(current_user_id)
+        })
+        
+        if not book_data:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Create takeaway
+        takeaway_data = {
+            'takeaway': data['takeaway'],
+            'page_reference': data.get('page_reference', ''),
+            'added_at': datetime.utcnow()
+        }
+        
+        # Add takeaway to book
+        current_app.mongo.db.books.update_one(
+            {'_id': ObjectId(book_id)},
+            {'$push': {'takeaways': takeaway_data}, '$set': {'updated_at': datetime.utcnow()}}
+        )
+        
+        # Award points for adding takeaway
+        award_points(
+            current_app.mongo.db, ObjectId(current_user_id), 2, 'nook',
+            f'Added takeaway from {book_data["title"]}',
+            metadata={'book_id': book_id},
+            counters={'takeaways_added': 1}
+        )
+        
+        return jsonify({
+            'message': 'Takeaway added successfully',
+            'takeaway': takeaway_data
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to add takeaway', 'details': str(e)}), 500
+
+@nook_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_books():
+    try:
+        query = request.args.get('q', '').strip()
+        
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        # Search Google Books
+        books = search_google_books(query)
+        
+        return jsonify({
+            'books': books,
+            'total': len(books)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Search failed', 'details': str(e)}), 500
+
+@nook_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get date range
+        days = int(request.args.get('days', 30))
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        # One round trip: sessions in range (or their day buckets), with the
+        # user's books appended as {_book: {...}} documents
+        is_session = {'$match': {'_book': {'$exists': False}}}
+        is_book = {'$match': {'_book': {'$exists': True}}}
+        
+        if buckets_enabled():
+            # Ranges are whole days
+            source = current_app.mongo.db.reading_buckets
+            match = {'user_id': ObjectId(current_user_id), 'day': {'$gte': bucket_day(start_date)}}
+            session_facets = {
+                'sessions': [
+                    is_session,
+                    {'$group': {
+                        '_id': None,
+                        'count': {'$sum': '$sessions'},
+                        'pages': {'$sum': '$pages_read'},
+                        'minutes': {'$sum': '$duration_minutes'}
+                    }}
+                ],
+                'by_hour': [
+                    is_session,
+                    {'$unwind': '$events'},
+                    {'$group': {
+                        '_id': {'$hour': '$events.date'},
+                        'sessions': {'$sum': 1},
+                        'minutes': {'$sum': {'$ifNull': ['$events.duration_minutes', 0]}}
+                    }}
+                ],
+                'by_weekday': [
+                    is_session,
+                    {'$group': {
+                        '_id': {'$isoDayOfWeek': '$day'},
+                        'sessions': {'$sum': '$sessions'},
+                        'minutes': {'$sum': '$duration_minutes'}
+                    }}
+                ],
+                'recent': [
+                    is_session,
+                    {'$sort': {'day': -1}},
+                    {'$limit': 10},
+                    {'$unwind': '$events'},
+                    {'$sort': {'events.date': -1}},
+                    {'$limit': 10},
+                    {'$replaceRoot': {'newRoot': {'$mergeObjects': [{'user_id': '$user_id'}, '$events']}}}
+                ]
+            }
+        else:
+            # Sessions from the (user_id, date) index
+            source = current_app.mongo.db.reading_sessions
+            match = {'user_id': ObjectId(current_user_id), 'date': {'$gte': start_date}}
+            session_facets = {
+                'sessions': [
+                    is_session,
+                    {'$group': {
+                        '_id': None,
+                        'count': {'$sum': 1},
+                        'pages': {'$sum': {'$ifNull': ['$pages_read', 0]}},
+                        'minutes': {'$sum': {'$ifNull': ['$duration_minutes', 0]}}
+                    }}
+                ],
+                'by_hour': [
+                    is_session,
+                    {'$group': {
+                        '_id': {'$hour': '$date'},
+                        'sessions': {'$sum': 1},
+                        'minutes': {'$sum': {'$ifNull': ['$duration_minutes', 0]}}
+                    }}
+                ],
+                'by_weekday': [
+                    is_session,
+                    {'$group': {
+                        '_id': {'$isoDayOfWeek': '$date'},
+                        'sessions': {'$sum': 1},
+                        'minutes': {'$sum': {'$ifNull': ['$duration_minutes', 0]}}
+                    }}
+                ],
+                'recent': [
+                    is_session,
+                    {'$sort': {'date': -1}},
+                    {'$limit': 10}
+                ]
+            }
+        
+        result = list(source.aggregate([
+            {'$match': match},
+            {'$unionWith': {'coll': 'books', 'pipeline': [
+                {'$match': {'user_id': ObjectId(current_user_id)}},
+                {'$project': {'_id': 0, '_book': {'status': '$status', 'genre': '$genre'}}}
+            ]}},
+            {'$facet': {
+                **session_facets,
+                'books': [
+                    is_book,
+                    {'$group': {
+                        '_id': None,
+                        'total': {'$sum': 1},
+                        'finished': {'$sum': {'$cond': [{'$eq': ['$_book.status', 'finished']}, 1, 0]}}
+                    }}
+                ],
+                'genres': [
+                    is_book,
+                    {'$group': {'_id': '$_book.genre', 'count': {'$sum': 1}}},
+                    {'$sort': {'count': -1}}
+                ]
+            }}
+        ]))[0]
+        
+        sessions = result['sessions'][0] if result['sessions'] else {'count': 0, 'pages': 0, 'minutes': 0}
+        books = result['books'][0] if result['books'] else {'total': 0, 'finished': 0}
+        
+        # Reading streak is maintained on the user
+        user_data = current_app.mongo.db.users.find_one({'_id': ObjectId(current_user_id)}, {'stats': 1})
+        reading_streak = current_streak((user_data or {}).get('stats', {}), 'reading')
+        
+        # Reading time by hour of day (UTC) and by weekday
+        by_hour = {row['_id']: row for row in result['by_hour']}
+        reading_by_hour = [
+            {'hour': hour, 'sessions': by_hour.get(hour, {}).get('sessions', 0), 'minutes': by_hour.get(hour, {}).get('minutes', 0)}
+            for hour in range(24)
+        ]
+        by_weekday = {row['_id']: row for row in result['by_weekday']}
+        reading_by_weekday = [
+            {'weekday': name, 'sessions': by_weekday.get(day, {}).get('sessions', 0), 'minutes': by_weekday.get(day, {}).get('minutes', 0)}
+            for day, name in enumerate(WEEKDAYS, start=1)
+        ]
+        
+        return jsonify({
+            'total_books': books['total'],
+            'finished_books': books['finished'],
+            'total_pages_read': sessions['pages'],
+            'total_reading_time': sessions['minutes'],
+            'reading_streak': reading_streak,
+            'average_pages_per_session': sessions['pages'] / max(1, sessions['count']),
+            'books_by_genre': result['genres'],
+            'reading_time_by_hour': reading_by_hour,
+            'reading_time_by_weekday': reading_by_weekday,
+            'recent_sessions': result['recent']
+        }), 200
+        
+    except Exception as e:
         return jsonify({'error': 'Failed to get analytics', 'details': str(e)}), 500
\ No newline at end of file
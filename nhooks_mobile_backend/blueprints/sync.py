@@ -0,0 +1,383 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from activity_buckets import add_sessions, add_tasks
+from change_tracking import InvalidSyncToken, get_changes
+from points import award_points_many, update_counters
+from timer_events import publish_timer
+
+sync_bp = Blueprint('sync', __name__)
+
+SYNC_MAX_EVENTS = 500
+SYNC_MAX_CLOCK_SKEW = timedelta(minutes=5)
+SYNC_MAX_EVENT_AGE = timedelta(days=30)
+SYNC_MAX_TIMER_MINUTES = 24 * 60
+SYNC_CHANGES_LIMIT = 500
+
+DUPLICATE_KEY_ERROR = 11000
+
+class SyncError(ValueError):
+    """An event that cannot be applied; reported in the event's outcome"""
+
+def parse_client_timestamp(value, now):
+    """Parse an event's client timestamp (ISO 8601 or datetime) to naive UTC"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise SyncError('Invalid client_timestamp')
+    if not isinstance(value, datetime):
+        raise SyncError('client_timestamp is required')
+    
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    
+    if value > now + SYNC_MAX_CLOCK_SKEW:
+        raise SyncError('client_timestamp is in the future')
+    if value < now - SYNC_MAX_EVENT_AGE:
+        raise SyncError('client_timestamp is too old to sync')
+    
+    return min(value, now)
+
+def _object_id(value, field):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise SyncError(f'Invalid {field}')
+
+class SyncBatch:
+    """Validates a batch of offline events against in-memory state.
+    
+    All state the events depend on (the user's books, active timer and already
+    applied event ids) is loaded up front with one query per collection. Each
+    event is then checked and applied to that in-memory state in order, and
+    the resulting writes are collected for ``commit``.
+    """
+
+    def __init__(self, db, user_id, events, now):
+        self.db = db
+        self.user_id = user_id
+        self.events = events
+        self.now = now
+        
+        self.outcomes = []
+        self.sessions = []
+        self.tasks = []
+        self.awards = []  # (event index, award)
+        self.counters = []  # (event index, activity counters)
+        self.book_updates = []  # (event index, book id, fields)
+        self.timer_event = None  # index of the event completing the active timer
+        
+        self._load_state()
+    
+    def _load_state(self):
+        book_ids = set()
+        event_ids = set()
+        for event in self.events:
+            if not isinstance(event, dict):
+                continue
+            if event.get('client_event_id'):
+                event_ids.add(str(event['client_event_id']))
+            if event.get('type') == 'progress' and ObjectId.is_valid(event.get('book_id')):
+                book_ids.add(ObjectId(event['book_id']))
+        
+        self.books = {
+            book['_id']: book
+            for book in self.db.books.find(
+                {'_id': {'$in': list(book_ids)}, 'user_id': self.user_id},
+                {'title': 1, 'current_page': 1, 'page_count': 1, 'status': 1}
+            )
+        }
+        
+        self.active_timer = self.db.active_timers.find_one({'user_id': self.user_id})
+        
+        # Events already applied by an earlier (retried) batch
+        self.applied_event_ids = set()
+        if event_ids:
+            query = {'user_id': self.user_id, 'client_event_id': {'$in': list(event_ids)}}
+            for collection in (self.db.reading_sessions, self.db.completed_tasks):
+                for document in collection.find(query, {'client_event_id': 1}):
+                    self.applied_event_ids.add(document['client_event_id'])
+    
+    def validate(self):
+        seen = set()
+        
+        for index, event in enumerate(self.events):
+            outcome = {'index': index, 'status': 'applied', 'points_earned': 0}
+            self.outcomes.append(outcome)
+            
+            try:
+                if not isinstance(event, dict):
+                    raise SyncError('Event must be an object')
+                
+                event_id = event.get('client_event_id')
+                if not event_id:
+                    raise SyncError('client_event_id is required')
+                event_id = str(event_id)
+                outcome['client_event_id'] = event_id
+                
+                if event_id in seen or event_id in self.applied_event_ids:
+                    outcome['status'] = 'duplicate'
+                    continue
+                seen.add(event_id)
+                
+                timestamp = parse_client_timestamp(event.get('client_timestamp'), self.now)
+                
+                if event.get('type') == 'progress':
+                    self._apply_progress(index, event_id, event, timestamp, outcome)
+                elif event.get('type') == 'timer_complete':
+                    self._apply_timer_complete(index, event_id, event, timestamp, outcome)
+                else:
+                    raise SyncError('Unknown event type')
+            
+            except SyncError as e:
+                outcome['status'] = 'rejected'
+                outcome['error'] = str(e)
+    
+    def _apply_progress(self, index, event_id, event, timestamp, outcome):
+        book_id = _object_id(event.get('book_id'), 'book_id')
+        book = self.books.get(book_id)
+        if not book:
+            raise SyncError('Book not found')
+        
+        current_page = event.get('current_page')
+        if not isinstance(current_page, int) or current_page < 0:
+            raise SyncError('current_page must be a non-negative integer')
+        
+        # Same rules as POST /api/nook/books/<id>/progress
+        pages_read = max(0, current_page - book.get('current_page', 0))
+        update_data = {'current_page': current_page}
+        
+        if current_page > 0 and book['status'] == 'to_read':
+            update_data['status'] = 'reading'
+        elif current_page >= book.get('page_count', 0) and book['status'] != 'finished':
+            update_data['status'] = 'finished'
+            update_data['finished_at'] = timestamp
+            self.counters.append((index, {'books_finished': 1}))
+        
+        book.update(update_data)
+        self.book_updates.append((index, book_id, update_data))
+        
+        self.sessions.append((index, {
+            'user_id': self.user_id,
+            'book_id': book_id,
+            'pages_read': pages_read,
+            'current_page': current_page,
+            'duration_minutes': event.get('duration_minutes', 0),
+            'notes': event.get('session_notes', ''),
+            'date': timestamp,
+            'updated_at': self.now,
+            'client_event_id': event_id,
+            'synced_at': self.now
+        }))
+        
+        points_earned = min(pages_read, 20)
+        if points_earned > 0:
+            self.awards.append((index, {
+                'points': points_earned,
+                'source': 'nook',
+                'description': f'Read {pages_read} pages in {book["title"]}',
+                'earned_at': timestamp,
+                'metadata': {'book_id': str(book_id), 'pages_read': pages_read}
+            }))
+        
+        outcome['points_earned'] = points_earned
+        outcome['book'] = {'_id': book_id, 'current_page': book['current_page'], 'status': book['status']}
+    
+    def _apply_timer_complete(self, index, event_id, event, timestamp, outcome):
+        mood_rating = event.get('mood_rating')
+        if mood_rating is not None and (not isinstance(mood_rating, int) or not 1 <= mood_rating <= 5):
+            raise SyncError('mood_rating must be between 1 and 5')
+        
+        # Timers started offline carry their own details; otherwise the
+        # server's active timer is completed
+        timer = event.get('timer')
+        if timer is None:
+            timer = self.active_timer
+            if not timer or self.timer_event is not None:
+                raise SyncError('No active timer found')
+            started_at = timer['started_at']
+            end = timer['paused_at'] if timer['status'] == 'paused' else timestamp
+        elif isinstance(timer, dict) and timer.get('task_name'):
+            started_at = parse_client_timestamp(timer.get('started_at', timestamp), self.now)
+            end = timestamp
+        else:
+            raise SyncError('timer.task_name is required')
+        
+        actual_duration_minutes = event.get('actual_duration')
+        if actual_duration_minutes is None:
+            actual_duration = (end - started_at).total_seconds() - timer.get('total_paused_time', 0)
+            actual_duration_minutes = int(actual_duration / 60)
+        if not isinstance(actual_duration_minutes, int):
+            raise SyncError('actual_duration must be an integer')
+        actual_duration_minutes = min(SYNC_MAX_TIMER_MINUTES, max(1, actual_duration_minutes))
+        
+        if timer is self.active_timer:
+            self.timer_event = index
+        
+        self.tasks.append((index, {
+            'user_id': self.user_id,
+            'task_name': timer['task_name'],
+            'planned_duration': timer.get('duration', actual_duration_minutes),
+            'actual_duration': actual_duration_minutes,
+            'category': timer.get('category', 'general'),
+            'timer_type': timer.get('timer_type', 'pomodoro'),
+            'mood_rating': mood_rating,
+            'notes': event.get('notes', ''),
+            'completed_at': timestamp,
+            'updated_at': self.now,
+            'started_at': started_at,
+            'client_event_id': event_id,
+            'synced_at': self.now
+        }))
+        
+        # Same rules as POST /api/hook/timers/complete
+        points_earned = max(1, actual_duration_minutes // 5)
+        if mood_rating and mood_rating >= 4:
+            points_earned += 2
+        
+        self.counters.append((index, {'tasks_completed': 1}))
+        self.awards.append((index, {
+            'points': points_earned,
+            'source': 'hook',
+            'description': f'Completed {timer["task_name"]} ({actual_duration_minutes} min)',
+            'earned_at': timestamp,
+            'metadata': {
+                'task_name': timer['task_name'],
+                'duration': actual_duration_minutes,
+                'category': timer.get('category', 'general')
+            }
+        }))
+        
+        outcome['points_earned'] = points_earned
+        outcome['actual_duration'] = actual_duration_minutes
+    
+    def _insert(self, collection, entries):
+        """Insert event documents unordered, reporting events that lost a
+        race with a concurrent retry of the same batch as duplicates"""
+        if not entries:
+            return
+        
+        try:
+            collection.insert_many([document for _, document in entries], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details['writeErrors']:
+                index = entries[error['index']][0]
+                if error['code'] != DUPLICATE_KEY_ERROR:
+                    raise
+                self.outcomes[index]['status'] = 'duplicate'
+                self.outcomes[index]['points_earned'] = 0
+    
+    def commit(self):
+        """Apply the collected writes with one bulk operation per collection"""
+        # Claim the active timer first, so a concurrent completion over
+        # /api/hook or the expiry sweep cannot record it too
+        if self.timer_event is not None and self.outcomes[self.timer_event]['status'] == 'applied':
+            if not self.db.active_timers.find_one_and_delete({
+                '_id': self.active_timer['_id'],
+                'status': {'$in': ['active', 'paused']}
+            }):
+                outcome = self.outcomes[self.timer_event]
+                outcome.pop('actual_duration', None)
+                outcome.update(status='rejected', error='No active timer found', points_earned=0)
+            else:
+                publish_timer(self.user_id, 'completed')
+        
+        self._insert(self.db.reading_sessions, self.sessions)
+        self._insert(self.db.completed_tasks, [
+            (index, task) for index, task in self.tasks if self.outcomes[index]['status'] == 'applied'
+        ])
+        add_sessions(self.db, [session for index, session in self.sessions if self.outcomes[index]['status'] == 'applied'])
+        add_tasks(self.db, [task for index, task in self.tasks if self.outcomes[index]['status'] == 'applied'])
+        
+        # Book fields from applied events only, later events winning: an
+        # event that lost a race would write stale progress
+        book_updates = {}
+        for index, book_id, update_data in self.book_updates:
+            if self.outcomes[index]['status'] == 'applied':
+                book_updates.setdefault(book_id, {}).update(update_data)
+        if book_updates:
+            self.db.books.bulk_write([
+                UpdateOne({'_id': book_id, 'user_id': self.user_id}, {'$set': dict(update_data, updated_at=self.now)})
+                for book_id, update_data in book_updates.items()
+            ], ordered=False)
+        
+        # One ledger insert and one aggregated $inc for the whole batch
+        awards = [award for index, award in self.awards if self.outcomes[index]['status'] == 'applied']
+        counters = {}
+        for index, event_counters in self.counters:
+            if self.outcomes[index]['status'] == 'applied':
+                for counter, amount in event_counters.items():
+                    counters[counter] = counters.get(counter, 0) + amount
+        
+        # Days with activity, for streaks
+        activities = [('reading', session['date'].date()) for index, session in self.sessions
+                      if self.outcomes[index]['status'] == 'applied']
+        activities += [('productivity', task['completed_at'].date()) for index, task in self.tasks
+                       if self.outcomes[index]['status'] == 'applied']
+        
+        if awards:
+            award_points_many(self.db, self.user_id, awards, counters, activities)
+        else:
+            update_counters(self.db, self.user_id, counters, activities)
+        
+        return sum(award['points'] for award in awards)
+
+@sync_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def sync_batch():
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        # Validate events
+        events = data.get('events') if isinstance(data, dict) else None
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'A non-empty events list is required'}), 400
+        
+        if len(events) > SYNC_MAX_EVENTS:
+            return jsonify({'error': f'At most {SYNC_MAX_EVENTS} events can be synced per batch'}), 400
+        
+        batch = SyncBatch(current_app.mongo.db, ObjectId(current_user_id), events, datetime.utcnow())
+        batch.validate()
+        points_earned = batch.commit()
+        
+        summary = {'applied': 0, 'duplicate': 0, 'rejected': 0}
+        for outcome in batch.outcomes:
+            summary[outcome['status']] += 1
+        
+        return jsonify({
+            'message': 'Sync completed',
+            'results': batch.outcomes,
+            'summary': summary,
+            'points_earned': points_earned
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': 'Failed to sync events', 'details': str(e)}), 500
+
+@sync_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def sync_changes():
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        since = request.args.get('since')
+        limit = min(int(request.args.get('limit', SYNC_CHANGES_LIMIT)), SYNC_CHANGES_LIMIT)
+        
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+        
+        result = get_changes(current_app.mongo.db, ObjectId(current_user_id), since, limit)
+        
+        return jsonify(result), 200
+        
+    except InvalidSyncToken as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to get changes', 'details': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Change tracking for delta sync.
+
+Every synced document carries an ``updated_at`` timestamp that is set on
+insert and on every update. Deletions leave a tombstone in the ``tombstones``
+collection, which expires after ``TOMBSTONE_RETENTION``. A client that last
+synced before that has to start over with a full sync.
+
+``get_changes`` walks the synced collections in a fixed order with keyset
+pagination on ``(updated_at, _id)``. Its position is returned to the client
+as an opaque token, so a sync can be resumed page by page and the next sync
+starts where the last one finished.
+"""
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+import base64
+
+from serialization import dumps_bytes, loads
+
+# Synced collections, in the order they are returned. The second value is
+# the creation timestamp used to backfill documents written before change
+# tracking existed.
+SYNC_COLLECTIONS = [
+    ('books', 'added_at'),
+    ('reading_sessions', 'date'),
+    ('completed_tasks', 'completed_at'),
+    ('rewards', 'earned_at'),
+    ('quote_submissions', 'submitted_at'),
+    ('flashcards', 'created_at')
+]
+
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+# Writes are stamped before they commit, so each sync re-reads a short
+# window before the previous high-water mark to catch late commits
+SYNC_OVERLAP = timedelta(seconds=5)
+
+TOKEN_VERSION = 1
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def _to_millis(value):
+    return None if value is None else int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _from_millis(value):
+    return None if value is None else datetime(1970, 1, 1) + timedelta(milliseconds=value)
+
+
+def encode_token(state):
+    """Encode a sync position as an opaque URL-safe token"""
+    payload = {
+        'v': TOKEN_VERSION,
+        'since': _to_millis(state['since']),
+        'until': _to_millis(state.get('until')),
+        'c': state.get('collection', 0),
+        'after': state.get('after')
+    }
+    return base64.urlsafe_b64encode(dumps_bytes(payload)).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    try:
+        payload = loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if payload['v'] != TOKEN_VERSION:
+            raise InvalidSyncToken('Unsupported sync token version')
+
+        after = payload.get('after')
+        if after is not None:
+            after = [after[0], str(ObjectId(after[1]))]
+
+        return {
+            'since': _from_millis(payload['since']),
+            'until': _from_millis(payload['until']),
+            'collection': int(payload['c']),
+            'after': after
+        }
+    except InvalidSyncToken:
+        raise
+    except (ValueError, TypeError, KeyError, IndexError, InvalidId):
+        raise InvalidSyncToken('Invalid sync token')
+
+
+def record_deletions(db, user_id, collection, document_ids):
+    """Leave tombstones for deleted documents so clients can drop them"""
+    now = datetime.utcnow()
+    tombstones = [{
+        'user_id': user_id,
+        'collection': collection,
+        'document_id': document_id,
+        'deleted_at': now
+    } for document_id in document_ids]
+
+    if tombstones:
+        db.tombstones.insert_many(tombstones, ordered=False)
+
+
+def _page_query(user_id, field, state):
+    query = {'user_id': user_id, field: {'$lt': state['until']}}
+    if state['since'] is not None:
+        query[field]['$gte'] = state['since']
+
+    if state['after']:
+        after_time = _from_millis(state['after'][0])
+        after_id = ObjectId(state['after'][1])
+        query = {'$and': [query, {'$or': [
+            {field: {'$gt': after_time}},
+            {field: after_time, '_id': {'$gt': after_id}}
+        ]}]}
+
+    return query
+
+
+def get_changes(db, user_id, token=None, limit=500):
+    """Return up to ``limit`` documents changed since ``token``.
+
+    The result has ``changes`` (documents per collection), ``deleted``
+    (document ids per collection), ``next_token`` and ``has_more``. While
+    ``has_more`` is true the client should call again with ``next_token``.
+    Once it is false, ``next_token`` is the starting point for the next sync.
+    ``reset`` is true when the client's data is too old for a delta and it
+    must replace its local copy with the returned documents.
+    """
+    now = datetime.utcnow()
+    reset = False
+
+    if token:
+        state = decode_token(token)
+        if state['since'] is not None and state['since'] < now - TOMBSTONE_RETENTION:
+            state = {'since': None, 'until': None, 'collection': 0, 'after': None}
+            reset = True
+    else:
+        state = {'since': None, 'until': None, 'collection': 0, 'after': None}
+
+    # A fresh sync fixes its upper bound so paging sees a stable window
+    if state['until'] is None:
+        state['until'] = now
+
+    sources = [(name, 'updated_at') for name, _ in SYNC_COLLECTIONS] + [('tombstones', 'deleted_at')]
+    changes = {name: [] for name, _ in SYNC_COLLECTIONS}
+    deleted = {}
+    remaining = limit
+
+    while state['collection'] < len(sources) and remaining > 0:
+        name, field = sources[state['collection']]
+
+        documents = list(
+            db[name].find(_page_query(user_id, field, state))
+            .sort([(field, 1), ('_id', 1)])
+            .limit(remaining)
+        )
+
+        if name == 'tombstones':
+            for tombstone in documents:
+                deleted.setdefault(tombstone['collection'], []).append(tombstone['document_id'])
+        else:
+            changes[name].extend(documents)
+
+        remaining -= len(documents)
+
+        if remaining > 0:
+            # Collection exhausted, move on to the next one
+            state['collection'] += 1
+            state['after'] = None
+        else:
+            last = documents[-1]
+            state['after'] = [_to_millis(last[field]), str(last['_id'])]
+
+    has_more = state['collection'] < len(sources)
+    if has_more:
+        next_token = encode_token(state)
+    else:
+        next_token = encode_token({'since': state['until'] - SYNC_OVERLAP})
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'next_token': next_token,
+        'has_more': has_more,
+        'reset': reset,
+        'server_time': now
+    }
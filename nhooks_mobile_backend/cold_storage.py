@@ -0,0 +1,193 @@
+"""
+Cold storage for inactive users.
+
+``python maintenance.py archive-inactive`` packs every per-user document of
+users who have not logged in for ``COLD_STORAGE_AFTER_DAYS`` into a single
+``cold_users`` document and removes them from the hot collections:
+
+    {'_id': <user id>, 'counts': {'books': 12, 'rewards': 340, ...},
+     'archived_at': ..., 'blob': <zlib'd BSON of {collection: [documents]}>}
+
+The user document itself stays hot, so points, levels, badges, streaks and
+leaderboards are unaffected. It carries a ``cold_state`` ('archiving',
+'archived' or 'restoring') while the user is in or moving through cold
+storage. The next login restores the documents with their original ids
+before the user gets a token, so clients and delta sync see nothing
+change. The hot collections and their indexes then grow with active users
+rather than with every signup.
+
+Both directions hold a short lease on the user document, and every step
+is safe to repeat, so an archive or restore interrupted by a crash is
+finished by whichever comes next. Archived documents are not tombstoned:
+no client of a cold user can still hold a valid refresh token, which is
+why the inactivity threshold must be longer than JWT_REFRESH_TOKEN_EXPIRES.
+"""
+
+from bson import Binary
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+import bson
+import time
+import zlib
+
+# Per-user collections moved to cold storage, all keyed by ``user_id``
+COLD_COLLECTIONS = (
+    'books',
+    'reading_sessions',
+    'completed_tasks',
+    'rewards',
+    'flashcards',
+    'reading_buckets',
+    'task_buckets'
+)
+
+COLD_COMPRESSION_LEVEL = 9
+
+# Users whose packed documents exceed this stay hot, well clear of the
+# 16MB document limit
+COLD_MAX_BLOB_BYTES = 12 * 1024 * 1024
+
+# How long an archive or restore may hold a user before another run takes over
+COLD_LEASE = timedelta(minutes=5)
+
+# How long a login waits for an archive run that is holding its user
+RESTORE_WAIT_SECONDS = 10
+RESTORE_POLL_SECONDS = 0.2
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ColdStorageBusy(Exception):
+    """The user is held by an archive run that has not finished yet"""
+
+
+def encode_documents(documents):
+    return Binary(zlib.compress(bson.encode(documents), COLD_COMPRESSION_LEVEL))
+
+
+def decode_documents(blob):
+    return bson.decode(zlib.decompress(blob))
+
+
+def inactive_query(cutoff, now=None):
+    """Users eligible for cold storage: last seen before ``cutoff``, not
+    cold already, or left mid-archive by a crashed run"""
+    now = now or datetime.utcnow()
+    return {
+        '$and': [
+            {'$or': [
+                {'last_login': {'$lt': cutoff}},
+                {'last_login': None, 'created_at': {'$lt': cutoff}}
+            ]},
+            {'$or': [
+                {'cold_state': {'$exists': False}},
+                {'cold_state': 'archiving', 'cold_lease_until': {'$lt': now}}
+            ]}
+        ]
+    }
+
+
+def _acquire(db, user_id, query, state, now):
+    return db.users.find_one_and_update(
+        dict(query, _id=user_id),
+        {'$set': {'cold_state': state, 'cold_lease_until': now + COLD_LEASE}},
+        projection={'_id': 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def archive_user(db, user_id, cutoff, now=None):
+    """Move one inactive user's documents into cold storage.
+
+    Returns the number of documents archived, or None if the user was
+    skipped: active again, held by another run, with awards still pending,
+    or too large to pack into one document.
+    """
+    now = now or datetime.utcnow()
+    if db.rewards.count_documents({'user_id': user_id, 'pending': True}, limit=1):
+        return None
+    if not _acquire(db, user_id, inactive_query(cutoff, now), 'archiving', now):
+        return None
+
+    # Merge into the archive a crashed run may have left, by _id
+    existing = db.cold_users.find_one({'_id': user_id})
+    documents = decode_documents(existing['blob']) if existing else {}
+    for name in COLD_COLLECTIONS:
+        hot = list(db[name].find({'user_id': user_id}))
+        ids = {document['_id'] for document in hot}
+        documents[name] = hot + [document for document in documents.get(name, []) if document['_id'] not in ids]
+
+    blob = encode_documents(documents)
+    if len(blob) > COLD_MAX_BLOB_BYTES:
+        db.users.update_one(
+            {'_id': user_id, 'cold_state': 'archiving'},
+            {'$unset': {'cold_state': '', 'cold_lease_until': ''}}
+        )
+        return None
+
+    db.cold_users.replace_one({'_id': user_id}, {
+        '_id': user_id,
+        'counts': {name: len(rows) for name, rows in documents.items()},
+        'archived_at': now,
+        'blob': blob
+    }, upsert=True)
+
+    # Only the packed documents are removed: anything written since stays hot
+    for name, rows in documents.items():
+        if rows:
+            db[name].delete_many({'_id': {'$in': [document['_id'] for document in rows]}})
+
+    db.users.update_one(
+        {'_id': user_id, 'cold_state': 'archiving'},
+        {'$set': {'cold_state': 'archived', 'cold_since': now}, '$unset': {'cold_lease_until': ''}}
+    )
+    return sum(len(rows) for rows in documents.values())
+
+
+def _insert_missing(collection, documents):
+    """Insert documents by their original _id, skipping ones already back"""
+    if not documents:
+        return
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+
+
+def restore_user(db, user_id, wait=RESTORE_WAIT_SECONDS):
+    """Bring a cold user's documents back into the hot collections.
+
+    Waits up to ``wait`` seconds for an archive run holding the user, then
+    raises ColdStorageBusy. Returns the number of documents restored.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        now = datetime.utcnow()
+        held = _acquire(db, user_id, {'$or': [
+            {'cold_state': 'archived'},
+            {'cold_state': {'$exists': True}, 'cold_lease_until': {'$lt': now}}
+        ]}, 'restoring', now)
+        if held:
+            break
+        user = db.users.find_one({'_id': user_id}, {'cold_state': 1})
+        if not user or 'cold_state' not in user:
+            return 0
+        if time.monotonic() >= deadline:
+            raise ColdStorageBusy(f'User {user_id} is being moved to cold storage')
+        time.sleep(RESTORE_POLL_SECONDS)
+
+    restored = 0
+    archive = db.cold_users.find_one({'_id': user_id})
+    if archive:
+        for name, rows in decode_documents(archive['blob']).items():
+            _insert_missing(db[name], rows)
+            restored += len(rows)
+        db.cold_users.delete_one({'_id': user_id})
+
+    db.users.update_one(
+        {'_id': user_id, 'cold_state': 'restoring'},
+        {'$unset': {'cold_state': '', 'cold_lease_until': '', 'cold_since': ''}}
+    )
+    return restored
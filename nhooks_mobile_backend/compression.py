@@ -0,0 +1,214 @@
+"""
+Negotiated response compression.
+
+Responses are compressed with brotli, zstd or gzip, whichever the client
+prefers in ``Accept-Encoding`` and is installed here. Buffered responses are
+only compressed above ``COMPRESS_MIN_SIZE`` bytes. Streamed responses are
+compressed chunk by chunk as they are sent, so large exports are never held
+in memory. Use the ``compress`` decorator to change the level for one route.
+"""
+
+from flask import current_app, request
+from functools import wraps
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+DEFAULT_LEVELS = {'br': 4, 'zstd': 3, 'gzip': 6}
+LEVEL_RANGES = {'br': (0, 11), 'zstd': (1, 22), 'gzip': (1, 9)}
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/msgpack',
+    'text/csv',
+    'text/plain',
+    'text/html'
+}
+
+
+def available_encodings():
+    """Encodings this process can produce, in server preference order"""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+
+def compress(level=None, min_size=None):
+    """Override compression settings for a single route.
+
+    ``level`` is applied to every encoding (clamped to its valid range) and
+    ``level=0`` disables compression for the route. ``min_size`` overrides
+    ``COMPRESS_MIN_SIZE``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+
+        decorated_function.compression = {'level': level, 'min_size': min_size}
+        return decorated_function
+    return decorator
+
+
+class CompressionStats:
+    """Process-wide bytes-saved counters, reported by /api/admin/metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings = {}
+
+    def record(self, encoding, original_size, compressed_size):
+        with self._lock:
+            stats = self._encodings.setdefault(
+                encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0})
+            stats['responses'] += 1
+            stats['bytes_in'] += original_size
+            stats['bytes_out'] += compressed_size
+
+    def snapshot(self):
+        with self._lock:
+            encodings = {name: dict(stats) for name, stats in self._encodings.items()}
+
+        bytes_in = sum(stats['bytes_in'] for stats in encodings.values())
+        bytes_out = sum(stats['bytes_out'] for stats in encodings.values())
+        for stats in encodings.values():
+            stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+
+        return {
+            'responses': sum(stats['responses'] for stats in encodings.values()),
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'bytes_saved': bytes_in - bytes_out,
+            'ratio': bytes_out / bytes_in if bytes_in else None,
+            'encodings': encodings
+        }
+
+
+def _compressor(encoding, level):
+    """Return (compress, flush, finish) callables for an incremental stream"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.flush, compressor.finish
+
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return (compressor.compress,
+                lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush)
+
+    # wbits=31 produces a gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_bytes(encoding, level, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _stream(iterable, encoding, level, flush_size, stats):
+    compress_chunk, flush, finish = _compressor(encoding, level)
+    original_size = compressed_size = pending = 0
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            original_size += len(chunk)
+            pending += len(chunk)
+            compressed = compress_chunk(chunk)
+
+            # Small chunks (e.g. one NDJSON line) are batched inside the
+            # compressor and only flushed to the client every flush_size bytes
+            if pending >= flush_size:
+                compressed += flush()
+                pending = 0
+            if compressed:
+                compressed_size += len(compressed)
+                yield compressed
+
+        tail = finish()
+        compressed_size += len(tail)
+        yield tail
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+        stats.record(encoding, original_size, compressed_size)
+
+
+def _route_settings():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'compression', None) or {}
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config['COMPRESS_ENABLED'] or request.method == 'HEAD':
+        return response
+
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    settings = _route_settings()
+    if settings.get('level') == 0:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if not encoding:
+        return response
+
+    low, high = LEVEL_RANGES[encoding]
+    level = settings.get('level') or config['COMPRESS_LEVELS'].get(encoding, DEFAULT_LEVELS[encoding])
+    level = max(low, min(high, level))
+    stats = current_app.extensions['compression']
+
+    if response.is_streamed:
+        response.response = _stream(
+            response.response, encoding, level, config['COMPRESS_STREAM_FLUSH_SIZE'], stats)
+        response.headers.pop('Content-Length', None)
+    else:
+        min_size = settings.get('min_size')
+        if min_size is None:
+            min_size = config['COMPRESS_MIN_SIZE']
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        compressed = _compress_bytes(encoding, level, data)
+        response.set_data(compressed)
+        response.headers['X-Uncompressed-Length'] = str(len(data))
+        stats.record(encoding, len(data), len(compressed))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVELS', dict(DEFAULT_LEVELS))
+    app.config.setdefault('COMPRESS_STREAM_FLUSH_SIZE', 64 * 1024)
+    app.extensions['compression'] = CompressionStats()
+    app.after_request(compress_response)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Bulk Collection Export Tool
+Dumps large collections for analytics offload using parallel ranged scans
+
+Each collection is split into _id ranges (by ObjectId timestamp) that are
+scanned in parallel worker processes. Output is written as gzip-compressed
+NDJSON, Arrow IPC or Parquet segment files. Checkpoints are written after
+every segment, so an interrupted export resumes where it stopped without
+duplicating rows.
+
+Usage:
+    python export_collections.py --output exports/
+    python export_collections.py rewards --format parquet --workers 8
+    python export_collections.py --max-docs-per-sec 20000   # throttle
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import MongoClient
+from dotenv import load_dotenv
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+
+from serialization import dumps_bytes, encode_default
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow is only needed for the columnar formats
+    pyarrow = None
+
+EXPORTABLE_COLLECTIONS = ['reading_sessions', 'completed_tasks', 'rewards']
+FORMATS = {'ndjson': '.ndjson.gz', 'arrow': '.arrow', 'parquet': '.parquet'}
+
+# Columns of the columnar formats, the same for every segment of a
+# collection. Fields not listed are kept as one JSON object in ``extra``.
+EXPORT_COLUMNS = {
+    'reading_sessions': (
+        '_id', 'user_id', 'book_id', 'pages_read', 'current_page', 'duration_minutes', 'notes',
+        'date', 'last_activity_at', 'updates', 'client_event_id', 'synced_at', 'updated_at'
+    ),
+    'completed_tasks': (
+        '_id', 'user_id', 'task_name', 'planned_duration', 'actual_duration', 'category',
+        'timer_type', 'mood_rating', 'notes', 'started_at', 'completed_at', 'expired',
+        'client_event_id', 'synced_at', 'updated_at'
+    ),
+    'rewards': (
+        '_id', 'user_id', 'points', 'source', 'description', 'earned_at', 'metadata', 'counters',
+        'idempotency_key', 'batch_id', 'pending', 'updated_at'
+    )
+}
+EXTRA_COLUMN = 'extra'
+
+# Column types; unlisted columns are strings, with nested values as JSON.
+# Numbers are doubles because clients may send fractional durations.
+COLUMN_TYPES = {
+    'pages_read': 'double',
+    'current_page': 'double',
+    'duration_minutes': 'double',
+    'updates': 'double',
+    'planned_duration': 'double',
+    'actual_duration': 'double',
+    'mood_rating': 'double',
+    'points': 'double',
+    'pending': 'bool',
+    'expired': 'bool',
+    'date': 'timestamp',
+    'last_activity_at': 'timestamp',
+    'started_at': 'timestamp',
+    'completed_at': 'timestamp',
+    'earned_at': 'timestamp',
+    'synced_at': 'timestamp',
+    'updated_at': 'timestamp'
+}
+
+
+def get_database(uri, read_preference='secondaryPreferred'):
+    """Connect with a small pool and secondary-preferred reads"""
+    client = MongoClient(
+        uri,
+        maxPoolSize=2,
+        appname='nhooks-export',
+        readPreference=read_preference
+    )
+    return client.get_default_database()
+
+
+def plan_ranges(db, collection, count):
+    """Split a collection into ``count`` _id ranges by ObjectId timestamp.
+
+    Only the first and last _id are read (two index lookups), so planning is
+    cheap at any collection size. Returns [(lower, upper), ...] where upper is
+    exclusive and None for the final range.
+    """
+    first = db[collection].find_one({}, {'_id': 1}, sort=[('_id', 1)])
+    last = db[collection].find_one({}, {'_id': 1}, sort=[('_id', -1)])
+
+    if not first:
+        return []
+
+    start = first['_id'].generation_time.timestamp()
+    end = last['_id'].generation_time.timestamp() + 1
+    step = max(1, (end - start) / count)
+
+    bounds = [first['_id']]
+    for i in range(1, count):
+        bound = ObjectId.from_datetime(datetime.fromtimestamp(start + i * step, tz=timezone.utc))
+        if bound > bounds[-1]:
+            bounds.append(bound)
+
+    return [(bounds[i], bounds[i + 1] if i + 1 < len(bounds) else None) for i in range(len(bounds))]
+
+
+def _arrow_schema(columns):
+    types = {
+        'string': pyarrow.string(),
+        'double': pyarrow.float64(),
+        'bool': pyarrow.bool_(),
+        'timestamp': pyarrow.timestamp('ms')
+    }
+    return pyarrow.schema(
+        [(name, types[COLUMN_TYPES.get(name, 'string')]) for name in columns]
+        + [(EXTRA_COLUMN, pyarrow.string())]
+    )
+
+
+class RateLimiter:
+    """Simple pacing limiter: sleeps so that at most ``rate`` docs/sec pass"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_at = time.monotonic()
+
+    def wait(self, docs):
+        if not self.interval:
+            return
+        self.next_at = max(self.next_at, time.monotonic()) + docs * self.interval
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _column_value(value, kind):
+    if value is None:
+        return None
+    if kind == 'bool':
+        return value if isinstance(value, bool) else None
+    if kind == 'double':
+        # bool is an int subclass, so rule it out first
+        if isinstance(value, bool):
+            return None
+        return value if isinstance(value, (int, float)) else None
+    if kind == 'timestamp':
+        return value if isinstance(value, datetime) else None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, ObjectId):
+        return str(value)
+    return json.dumps(value, default=encode_default)
+
+
+def _flatten(document, columns):
+    """Make a document a row of ``columns``: missing fields as None, ids as
+    strings, nested values as JSON. Other fields, and values of the wrong
+    type for their column, go into ``extra`` as one JSON object."""
+    row = {}
+    extra = {key: value for key, value in document.items() if key not in columns}
+    for name in columns:
+        value = document.get(name)
+        row[name] = _column_value(value, COLUMN_TYPES.get(name, 'string'))
+        if row[name] is None and value is not None:
+            extra[name] = value
+    row[EXTRA_COLUMN] = json.dumps(extra, default=encode_default) if extra else None
+    return row
+
+
+def _write_segment(path, documents, fmt, columns=()):
+    """Write one segment to a temporary file and atomically move it into place"""
+    tmp_path = path + '.tmp'
+
+    if fmt == 'ndjson':
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            for document in documents:
+                f.write(dumps_bytes(document) + b'\n')
+    else:
+        table = pyarrow.Table.from_pylist(
+            [_flatten(document, columns) for document in documents],
+            schema=_arrow_schema(columns)
+        )
+        if fmt == 'parquet':
+            pyarrow.parquet.write_table(table, tmp_path, compression='zstd')
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(compression='zstd')
+            with pyarrow.ipc.new_file(tmp_path, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'last_id': None, 'segments': 0, 'count': 0, 'done': False}
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def export_range(task):
+    """Export one _id range. Runs in a worker process."""
+    uri, collection, index, lower, upper, options = task
+    output_dir = os.path.join(options['output'], collection)
+    prefix = os.path.join(output_dir, f'range-{index:04d}')
+    checkpoint_path = prefix + '.checkpoint.json'
+
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if checkpoint['done']:
+        return collection, index, checkpoint['count'], True
+
+    # Discard any segment left half-written by an interrupted run
+    for stray in glob.glob(prefix + '-*.tmp'):
+        os.remove(stray)
+
+    db = get_database(uri, options['read_preference'])
+    limiter = RateLimiter(options['docs_per_sec'])
+
+    query = {'_id': {'$gte': ObjectId(lower)}}
+    if upper:
+        query['_id']['$lt'] = ObjectId(upper)
+    if checkpoint['last_id']:
+        query['_id']['$gt'] = ObjectId(checkpoint['last_id'])
+        del query['_id']['$gte']
+
+    cursor = db[collection].find(query).sort('_id', 1).hint([('_id', 1)]).batch_size(options['batch_size'])
+    extension = FORMATS[options['format']]
+    segment = []
+
+    def flush_segment():
+        path = f"{prefix}-{checkpoint['segments']:05d}{extension}"
+        _write_segment(path, segment, options['format'], EXPORT_COLUMNS[collection])
+        checkpoint['segments'] += 1
+        checkpoint['count'] += len(segment)
+        checkpoint['last_id'] = str(segment[-1]['_id'])
+        _save_checkpoint(checkpoint_path, checkpoint)
+        segment.clear()
+
+    try:
+        for document in cursor:
+            segment.append(document)
+            if len(segment) % options['batch_size'] == 0:
+                limiter.wait(options['batch_size'])
+            if len(segment) >= options['segment_size']:
+                flush_segment()
+
+        if segment:
+            flush_segment()
+    finally:
+        cursor.close()
+        db.client.close()
+
+    checkpoint['done'] = True
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return collection, index, checkpoint['count'], False
+
+
+def export_collections(uri, collections, options):
+    """Plan ranges for each collection and export them in parallel"""
+    db = get_database(uri, options['read_preference'])
+    tasks = []
+
+    for collection in collections:
+        os.makedirs(os.path.join(options['output'], collection), exist_ok=True)
+        plan_path = os.path.join(options['output'], collection, 'ranges.json')
+
+        # Reuse the original plan on resume so range indexes stay stable
+        if os.path.exists(plan_path):
+            with open(plan_path) as f:
+                ranges = [tuple(r) for r in json.load(f)]
+        else:
+            ranges = [(str(lower), str(upper) if upper else None)
+                      for lower, upper in plan_ranges(db, collection, options['ranges'])]
+            with open(plan_path, 'w') as f:
+                json.dump(ranges, f)
+
+        print(f"✓ {collection}: {len(ranges)} ranges planned")
+        for index, (lower, upper) in enumerate(ranges):
+            tasks.append((uri, collection, index, lower, upper, options))
+
+    db.client.close()
+
+    totals = {collection: 0 for collection in collections}
+    started = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+        futures = [executor.submit(export_range, task) for task in tasks]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            collection, index, count, skipped = future.result()
+            totals[collection] += count
+            status = 'already done' if skipped else f'{count} docs'
+            print(f"  [{completed}/{len(tasks)}] {collection} range {index}: {status}")
+
+    elapsed = time.monotonic() - started
+    manifest = {
+        'exported_at': datetime.utcnow().isoformat(),
+        'format': options['format'],
+        'collections': totals,
+        'elapsed_seconds': round(elapsed, 1)
+    }
+    with open(os.path.join(options['output'], 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(totals.values())
+    print(f"\n✓ Exported {total} documents in {elapsed:.1f}s ({total / max(elapsed, 0.001):.0f} docs/sec)")
+    return totals
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export collections for analytics offload')
+    parser.add_argument('collections', nargs='*', metavar='collection',
+                        help=f"Collections to export: {', '.join(EXPORTABLE_COLLECTIONS)} (default: all)")
+    parser.add_argument('--output', default='exports', help='Output directory')
+    parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Parallel worker processes (default: CPU count)')
+    parser.add_argument('--ranges', type=int, default=None,
+                        help='_id ranges per collection (default: workers x 8)')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--segment-size', type=int, default=100000,
+                        help='Documents per output file / checkpoint')
+    parser.add_argument('--max-docs-per-sec', type=int, default=0,
+                        help='Overall read rate limit across all workers (0 = unlimited)')
+    parser.add_argument('--read-preference', default='secondaryPreferred',
+                        choices=['secondaryPreferred', 'secondary', 'primaryPreferred', 'primary'])
+
+    args = parser.parse_args()
+    for collection in args.collections:
+        if collection not in EXPORTABLE_COLLECTIONS:
+            parser.error(f'cannot export {collection!r}, choose from {EXPORTABLE_COLLECTIONS}')
+    return args
+
+
+def main():
+    """Main export function"""
+    load_dotenv()
+    args = parse_args()
+
+    if args.format != 'ndjson' and pyarrow is None:
+        print(f"✗ The {args.format} format requires pyarrow (pip install pyarrow)")
+        return 1
+
+    uri = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/hooks_mobile')
+    options = {
+        'output': args.output,
+        'format': args.format,
+        'workers': args.workers,
+        'ranges': args.ranges or args.workers * 8,
+        'batch_size': args.batch_size,
+        'segment_size': args.segment_size,
+        'docs_per_sec': args.max_docs_per_sec / args.workers if args.max_docs_per_sec else 0,
+        'read_preference': args.read_preference
+    }
+
+    print("=" * 60)
+    print("Nhooks Backend - Collection Export")
+    print("=" * 60)
+
+    try:
+        export_collections(uri, args.collections or EXPORTABLE_COLLECTIONS, options)
+    except Exception as e:
+        print(f"\n✗ Error during export: {str(e)}")
+        print("\nRe-run the same command to resume from the last checkpoint.")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
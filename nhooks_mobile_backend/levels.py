@@ -0,0 +1,60 @@
+"""
+Level progression.
+
+Levels follow a precomputed curve: reaching level ``n`` takes
+``50 * n * (n - 1)`` points (100 for level 2, 300 for level 3, 600 for
+level 4, ...), up to ``MAX_LEVEL``. Lookups bisect the threshold table, so
+deriving a level or the points still needed for the next one never touches
+the database.
+
+``points.award_points`` raises ``users.level`` with ``$max`` whenever an
+award crosses a threshold. Since balances only grow, concurrent awards
+converge on the right level without locking.
+"""
+
+from bisect import bisect_right
+
+MAX_LEVEL = 100
+
+# LEVEL_THRESHOLDS[i] is the points needed for level i + 1
+LEVEL_THRESHOLDS = tuple(50 * level * (level - 1) for level in range(1, MAX_LEVEL + 1))
+
+
+def level_for_points(points):
+    """The level a points balance has reached"""
+    return max(1, bisect_right(LEVEL_THRESHOLDS, points or 0))
+
+
+def level_progress(points):
+    """Level details for a points balance, for summary responses"""
+    points = points or 0
+    level = level_for_points(points)
+    current_threshold = LEVEL_THRESHOLDS[level - 1]
+
+    if level >= MAX_LEVEL:
+        return {
+            'level': level,
+            'next_level_points': None,
+            'points_to_next_level': 0,
+            'level_progress': 1.0
+        }
+
+    next_threshold = LEVEL_THRESHOLDS[level]
+    return {
+        'level': level,
+        'next_level_points': next_threshold,
+        'points_to_next_level': next_threshold - points,
+        'level_progress': round((points - current_threshold) / (next_threshold - current_threshold), 4)
+    }
+
+
+def apply_level(db, user):
+    """Raise a user's stored level to match their balance.
+
+    ``user`` is the post-award document with ``points`` and ``level``. Only
+    writes when a threshold was crossed. Returns the new level.
+    """
+    level = level_for_points(user.get('points', 0))
+    if level > user.get('level', 1):
+        db.users.update_one({'_id': user['_id']}, {'$max': {'level': level}})
+    return level
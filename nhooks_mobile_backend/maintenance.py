@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Maintenance Tasks
+Repair and backfill jobs for the Nhooks backend
+
+Usage:
+    python maintenance.py reconcile-awards
+    python maintenance.py backfill-levels --chunk-size 5000
+    python maintenance.py backfill-badges --workers 8 --chunk-size 1000
+    python maintenance.py sweep-timers [--loop]
+    python maintenance.py forecast-reading --chunk-size 2000
+    python maintenance.py compact-sessions --chunk-size 200
+    python maintenance.py migrate-buckets --chunk-size 5000
+    python maintenance.py archive-rewards [--months 12]
+    python maintenance.py archive-inactive [--days 180]
+"""
+
+from app import create_app
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from flask import current_app
+from pymongo import UpdateOne
+import argparse
+import os
+import time
+
+from activity_buckets import BUCKET_COLLECTIONS, session_operations, task_operations, write_buckets
+from badges import BadgeIndex, insert_user_badges
+from cold_storage import archive_user, inactive_query
+from export_collections import get_database, plan_ranges
+from levels import level_for_points
+from points import reconcile_pending_awards
+from reading_forecast import clear_stale_forecasts, forecast_books
+from reading_sessions import compact_sessions
+from rewards_archive import ARCHIVE_MIN_MONTHS, archive_cutoff, archive_rewards
+from streaks import STREAKS
+from timer_expiry import TimerSweeper
+
+# How far back backfilled streaks look for activity
+STREAK_BACKFILL_DAYS = 365
+
+
+def reconcile_awards(mongo, args):
+    """Finish point awards left pending by a crash"""
+    print("Reconciling pending point awards...")
+    count = reconcile_pending_awards(mongo.db)
+    print(f"✓ Reconciled {count} pending awards")
+
+
+def iter_chunks(collection, query, projection, chunk_size):
+    """Yield documents in _id order, one chunk per query (keyset pagination)"""
+    last_id = None
+    while True:
+        chunk_query = dict(query)
+        if last_id is not None:
+            chunk_query['_id'] = dict(query.get('_id', {}), **{'$gt': last_id})
+        chunk = list(collection.find(chunk_query, projection).sort('_id', 1).limit(chunk_size))
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['_id']
+
+
+def backfill_levels(mongo, args):
+    """Recompute every user's level from their points balance"""
+    print("Backfilling user levels...")
+    scanned = updated = 0
+
+    for chunk in iter_chunks(mongo.db.users, {}, {'points': 1, 'level': 1}, args.chunk_size):
+        operations = []
+        for user in chunk:
+            level = level_for_points(user.get('points', 0))
+            if level != user.get('level'):
+                operations.append(UpdateOne({'_id': user['_id']}, {'$set': {'level': level}}))
+
+        if operations:
+            updated += mongo.db.users.bulk_write(operations, ordered=False).modified_count
+        scanned += len(chunk)
+        print(f"  {scanned} users scanned, {updated} updated")
+
+    print(f"✓ Levels backfilled for {scanned} users ({updated} changed)")
+
+
+def _count_stats(db, user_ids):
+    """Activity counters for a chunk of users, one aggregation per collection"""
+    stats = {user_id: {} for user_id in user_ids}
+
+    books = db.books.aggregate([
+        {'$match': {'user_id': {'$in': user_ids}}},
+        {'$group': {
+            '_id': '$user_id',
+            'books_added': {'$sum': 1},
+            'books_finished': {'$sum': {'$cond': [{'$eq': ['$status', 'finished']}, 1, 0]}},
+            'quotes_added': {'$sum': {'$size': {'$ifNull': ['$quotes', []]}}},
+            'takeaways_added': {'$sum': {'$size': {'$ifNull': ['$takeaways', []]}}}
+        }}
+    ])
+    tasks = db.completed_tasks.aggregate([
+        {'$match': {'user_id': {'$in': user_ids}}},
+        {'$group': {'_id': '$user_id', 'tasks_completed': {'$sum': 1}}}
+    ])
+    verified = db.quote_submissions.aggregate([
+        {'$match': {'user_id': {'$in': user_ids}, 'status': 'verified'}},
+        {'$group': {'_id': '$user_id', 'quotes_verified': {'$sum': 1}}}
+    ])
+    created = db.clubs.aggregate([
+        {'$match': {'creator_id': {'$in': user_ids}}},
+        {'$group': {'_id': '$creator_id', 'clubs_created': {'$sum': 1}}}
+    ])
+    joined = db.clubs.aggregate([
+        {'$match': {'members': {'$in': user_ids}}},
+        {'$unwind': '$members'},
+        {'$match': {'members': {'$in': user_ids}}},
+        {'$group': {'_id': '$members', 'clubs_joined': {'$sum': 1}}}
+    ])
+
+    for cursor in (books, tasks, verified, created, joined):
+        for row in cursor:
+            stats[row.pop('_id')].update(row)
+
+    counters = ('books_added', 'books_finished', 'quotes_added', 'takeaways_added',
+                'tasks_completed', 'quotes_verified', 'clubs_created', 'clubs_joined')
+    for user_stats in stats.values():
+        for counter in counters:
+            user_stats.setdefault(counter, 0)
+    return stats
+
+
+def _streak_stats(db, collection, date_field, kind, user_ids, since):
+    """Current and best streaks from each user's distinct active days"""
+    streak_field = STREAKS[kind]
+    rows = db[collection].aggregate([
+        {'$match': {'user_id': {'$in': user_ids}, date_field: {'$gte': since}}},
+        {'$group': {'_id': {
+            'user_id': '$user_id',
+            'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': f'${date_field}'}}
+        }}},
+        {'$group': {'_id': '$_id.user_id', 'days': {'$push': '$_id.day'}}}
+    ])
+
+    streaks = {}
+    for row in rows:
+        days = sorted(datetime.strptime(day, '%Y-%m-%d').date() for day in row['days'])
+        run = best = 1
+        for previous, day in zip(days, days[1:]):
+            run = run + 1 if day - previous == timedelta(days=1) else 1
+            best = max(best, run)
+        streaks[row['_id']] = {
+            streak_field: run,
+            f'best_{streak_field}': best,
+            f'last_{kind}_day': days[-1].isoformat()
+        }
+    return streaks
+
+
+def backfill_badges_range(task):
+    """Backfill one _id range of users. Runs in a worker process."""
+    uri, lower, upper, chunk_size = task
+    db = get_database(uri, 'primary')
+    index = BadgeIndex(db.badges.find({}, {'requirements': 1}))
+    since = datetime.utcnow() - timedelta(days=STREAK_BACKFILL_DAYS)
+
+    query = {'_id': {'$gte': lower}}
+    if upper:
+        query['_id']['$lt'] = upper
+
+    users = badges = 0
+    try:
+        for chunk in iter_chunks(db.users, query, {'points': 1, 'badge_ids': 1}, chunk_size):
+            user_ids = [user['_id'] for user in chunk]
+            stats = _count_stats(db, user_ids)
+            for collection, date_field, kind in (('reading_sessions', 'date', 'reading'),
+                                                 ('completed_tasks', 'completed_at', 'productivity')):
+                for user_id, streaks in _streak_stats(db, collection, date_field, kind, user_ids, since).items():
+                    stats[user_id].update(streaks)
+
+            operations = []
+            user_badges = []
+            now = datetime.utcnow()
+            for user in chunk:
+                user_stats = stats[user['_id']]
+                update = {'$set': {f'stats.{key}': value for key, value in user_stats.items()}}
+
+                values = dict(user_stats, points=user.get('points', 0))
+                earned = index.earned(values, index.keys, user.get('badge_ids') or ())
+                if earned:
+                    update['$addToSet'] = {'badge_ids': {'$each': earned}}
+                    user_badges.extend(
+                        {'user_id': user['_id'], 'badge_id': badge_id, 'earned_at': now}
+                        for badge_id in earned
+                    )
+                operations.append(UpdateOne({'_id': user['_id']}, update))
+
+            # Badge rows first: a crash before the user update only means
+            # the next run finds the same badges and skips the duplicates
+            insert_user_badges(db, user_badges)
+            db.users.bulk_write(operations, ordered=False)
+            users += len(chunk)
+            badges += len(user_badges)
+    finally:
+        db.client.close()
+
+    return users, badges
+
+
+def backfill_badges(mongo, args):
+    """Recompute activity counters and streaks, and award earned badges.
+
+    Users are split into _id ranges processed in parallel, each worker with
+    its own connection. Counters are recomputed in chunks with one
+    ``$in`` aggregation per source collection, so the cost is a handful of
+    queries per chunk rather than per user. Run it when the write paths are
+    quiet: counter increments that land between a chunk's aggregation and
+    its update are overwritten.
+    """
+    print("Backfilling activity counters and badges...")
+    uri = current_app.config['MONGO_URI']
+    ranges = plan_ranges(mongo.db, 'users', args.workers * 4)
+    tasks = [(uri, lower, upper, args.chunk_size) for lower, upper in ranges]
+
+    users = badges = 0
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(backfill_badges_range, task) for task in tasks]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            range_users, range_badges = future.result()
+            users += range_users
+            badges += range_badges
+            print(f"  [{completed}/{len(tasks)}] {users} users scanned, {badges} badges awarded")
+
+    elapsed = time.monotonic() - started
+    print(f"✓ Badges backfilled for {users} users in {elapsed:.1f}s ({badges} awarded)")
+
+
+def sweep_timers(mongo, args):
+    """Expire abandoned timers, once or continuously"""
+    sweeper = TimerSweeper(current_app._get_current_object())
+    if args.loop:
+        print(f"Sweeping expired timers every {sweeper.interval}s (Ctrl+C to stop)...")
+        sweeper.run()
+        return
+
+    print("Sweeping expired timers...")
+    expired = sweeper.run_once()
+    print(f"✓ Expired {expired} timers")
+
+
+def forecast_reading(mongo, args):
+    """Recompute pace and finish forecasts for every book being read"""
+    print("Forecasting reading progress...")
+    now = datetime.utcnow()
+    books = 0
+
+    projection = {'user_id': 1, 'page_count': 1, 'current_page': 1}
+    for chunk in iter_chunks(mongo.db.books, {'status': 'reading'}, projection, args.chunk_size):
+        books += forecast_books(mongo.db, chunk, now)
+        print(f"  {books} books forecast")
+
+    cleared = clear_stale_forecasts(mongo.db, now)
+    print(f"✓ Forecasts updated for {books} books, cleared from {cleared} no longer being read")
+
+
+def compact_reading_sessions(mongo, args):
+    """Merge historical micro-sessions, a chunk of users at a time"""
+    print("Compacting reading sessions...")
+    window = timedelta(minutes=current_app.config['READING_SESSION_MERGE_MINUTES'])
+    users = runs = removed = 0
+
+    for chunk in iter_chunks(mongo.db.users, {}, {'_id': 1}, args.chunk_size):
+        chunk_runs, chunk_removed = compact_sessions(mongo.db, [user['_id'] for user in chunk], window)
+        users += len(chunk)
+        runs += chunk_runs
+        removed += chunk_removed
+        print(f"  {users} users scanned, {removed} sessions merged away")
+
+    print(f"✓ Compacted {runs} session runs ({removed} sessions removed)")
+
+
+def migrate_buckets(mongo, args):
+    """Build the day buckets from existing sessions and tasks.
+
+    Events already in their bucket are skipped, so the migration can run
+    while ACTIVITY_BUCKETS is on and can be re-run after an interruption.
+    """
+    print("Migrating activity into day buckets...")
+    for source, operations in (('reading_sessions', session_operations), ('completed_tasks', task_operations)):
+        target = mongo.db[BUCKET_COLLECTIONS[source]]
+        migrated = 0
+        for chunk in iter_chunks(mongo.db[source], {}, None, args.chunk_size):
+            write_buckets(target, operations(chunk))
+            migrated += len(chunk)
+            print(f"  {source}: {migrated} documents bucketed")
+        print(f"✓ {source}: {migrated} documents in {target.count_documents({})} buckets")
+
+
+def archive_old_rewards(mongo, args):
+    """Move ledger entries older than the retention window into monthly archives"""
+    months = args.months or current_app.config['REWARDS_ARCHIVE_MONTHS']
+    if months < ARCHIVE_MIN_MONTHS:
+        raise ValueError(f'Rewards must stay live for at least {ARCHIVE_MIN_MONTHS} months')
+
+    cutoff = archive_cutoff(months)
+    print(f"Archiving rewards earned before {cutoff.date()}...")
+    users = archived = written = 0
+
+    for chunk in iter_chunks(mongo.db.users, {}, {'_id': 1}, args.chunk_size):
+        chunk_archived, chunk_written = archive_rewards(mongo.db, [user['_id'] for user in chunk], cutoff)
+        users += len(chunk)
+        archived += chunk_archived
+        written += chunk_written
+        print(f"  {users} users scanned, {archived} rewards archived")
+
+    print(f"✓ Archived {archived} rewards into {written} monthly summaries")
+
+
+def archive_inactive_users(mongo, args):
+    """Move users who stopped logging in to cold storage"""
+    days = args.days or current_app.config['COLD_STORAGE_AFTER_DAYS']
+    inactive_for = timedelta(days=days)
+    if inactive_for <= current_app.config['JWT_REFRESH_TOKEN_EXPIRES']:
+        raise ValueError('Users must stay hot for longer than refresh tokens last')
+
+    cutoff = datetime.utcnow() - inactive_for
+    print(f"Archiving users inactive since {cutoff.date()}...")
+    users = skipped = documents = 0
+
+    for chunk in iter_chunks(mongo.db.users, inactive_query(cutoff), {'_id': 1}, args.chunk_size):
+        for user in chunk:
+            archived = archive_user(mongo.db, user['_id'], cutoff)
+            if archived is None:
+                skipped += 1
+            else:
+                users += 1
+                documents += archived
+        print(f"  {users} users archived, {skipped} skipped")
+
+    print(f"✓ Moved {documents} documents of {users} users to cold storage")
+
+
+COMMANDS = {
+    'reconcile-awards': reconcile_awards,
+    'backfill-levels': backfill_levels,
+    'backfill-badges': backfill_badges,
+    'sweep-timers': sweep_timers,
+    'forecast-reading': forecast_reading,
+    'compact-sessions': compact_reading_sessions,
+    'migrate-buckets': migrate_buckets,
+    'archive-rewards': archive_old_rewards,
+    'archive-inactive': archive_inactive_users
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run Nhooks maintenance tasks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('reconcile-awards', help='Finish point awards left pending by a crash')
+
+    levels_parser = subparsers.add_parser('backfill-levels', help='Recompute user levels from points')
+    levels_parser.add_argument('--chunk-size', type=int, default=5000)
+
+    badges_parser = subparsers.add_parser('backfill-badges',
+                                          help='Recompute activity counters and streaks, and award badges')
+    badges_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    badges_parser.add_argument('--chunk-size', type=int, default=1000)
+
+    sweep_parser = subparsers.add_parser('sweep-timers', help='Expire abandoned timers')
+    sweep_parser.add_argument('--loop', action='store_true', help='Keep sweeping every TIMER_SWEEP_INTERVAL seconds')
+
+    forecast_parser = subparsers.add_parser('forecast-reading', help='Recompute reading pace and finish forecasts')
+    forecast_parser.add_argument('--chunk-size', type=int, default=2000)
+
+    compact_parser = subparsers.add_parser('compact-sessions', help='Merge reading sessions saved minutes apart')
+    compact_parser.add_argument('--chunk-size', type=int, default=200)
+
+    buckets_parser = subparsers.add_parser('migrate-buckets', help='Build activity day buckets from existing data')
+    buckets_parser.add_argument('--chunk-size', type=int, default=5000)
+
+    archive_parser = subparsers.add_parser('archive-rewards', help='Archive old rewards into monthly summaries')
+    archive_parser.add_argument('--months', type=int, help='Months to keep live (default REWARDS_ARCHIVE_MONTHS)')
+    archive_parser.add_argument('--chunk-size', type=int, default=200)
+
+    cold_parser = subparsers.add_parser('archive-inactive', help='Move inactive users to cold storage')
+    cold_parser.add_argument('--days', type=int, help='Days without a login (default COLD_STORAGE_AFTER_DAYS)')
+    cold_parser.add_argument('--chunk-size', type=int, default=500)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main maintenance function"""
+    args = parse_args()
+
+    print("=" * 60)
+    print(f"Nhooks Backend - Maintenance: {args.command}")
+    print("=" * 60)
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            COMMANDS[args.command](app.mongo, args)
+        except Exception as e:
+            print(f"\n✗ Error during {args.command}: {str(e)}")
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,295 @@
+"""
+Point awards.
+
+Every point award goes through ``award_points`` (``award_points_many`` for
+batches, ``award_points_bulk`` for background jobs spanning users). An
+award is written in two idempotent phases, so it stays consistent under
+retries, concurrent requests and crashes without needing a replica-set
+transaction:
+
+1. The ledger entry is inserted into ``rewards`` with ``pending: True``.
+   Callers may pass an ``idempotency_key``. A retry of the same award then
+   hits the unique ``(user_id, idempotency_key)`` index and finishes the
+   original award instead of creating a second one.
+2. The user's balance, per-source rollup and activity counters are updated
+   with a single ``$inc``. The write is guarded by the award id in the
+   user's bounded ``applied_awards`` list, so it is applied at most once.
+   Then the ledger entry's ``pending`` flag is cleared, the user's level is
+   raised if the award crossed a threshold (``levels.py``), activity streaks
+   are advanced (``streaks.py``) and badges reached by the changed counters
+   are awarded (``badges.py``).
+
+Awards left pending by a crash between the phases are re-applied by
+``reconcile_pending_awards`` (``python maintenance.py reconcile-awards``).
+
+With ``REWARDS_WRITE_BEHIND`` enabled, phase one appends to the worker's
+journal (``rewards_buffer.py``) instead of inserting, and the ledger entries
+reach MongoDB in batches. Awards with an ``idempotency_key`` always bypass
+the buffer, because their duplicate check needs the unique index.
+"""
+
+from flask import current_app, has_app_context
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from badges import check_badges
+from levels import apply_level
+from streaks import record_activity
+
+# How many recent award ids each user keeps for the at-most-once guard.
+# Pending awards are reconciled long before they fall off the end.
+APPLIED_AWARDS_KEPT = 100
+
+RECONCILE_AFTER = timedelta(minutes=5)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _user_update(award_id, rewards, counters):
+    """The $inc applying ``rewards`` to a user, guarded by ``award_id``"""
+    inc = {'points': 0}
+    for reward in rewards:
+        inc['points'] += reward['points']
+        key = f"points_by_source.{reward['source']}"
+        inc[key] = inc.get(key, 0) + reward['points']
+    for counter, amount in (counters or {}).items():
+        inc[f'stats.{counter}'] = amount
+
+    return {
+        '$inc': inc,
+        '$push': {'applied_awards': {'$each': [award_id], '$slice': -APPLIED_AWARDS_KEPT}}
+    }
+
+
+def _buffer():
+    """The write-behind ledger buffer, when enabled"""
+    if has_app_context():
+        return current_app.extensions.get('rewards_buffer')
+    return None
+
+
+# Fields of the updated user needed for levels, streaks and badges
+USER_PROJECTION = {'points': 1, 'level': 1, 'stats': 1, 'badge_ids': 1}
+
+
+def _after_update(db, user, changed_keys, activities):
+    """Advance streaks and award badges reached by ``changed_keys``"""
+    changed_keys = set(changed_keys)
+    for kind, day in sorted(set(activities or ())):
+        streak = record_activity(db, user, kind, day)
+        if streak:
+            changed_keys.add(streak)
+    check_badges(db, user, changed_keys)
+
+
+def _apply(db, user_id, award_id, rewards, counters, buffer=None, activities=None):
+    """Phase two: update the user at most once, then clear the pending flags"""
+    user = db.users.find_one_and_update(
+        {'_id': user_id, 'applied_awards': {'$ne': award_id}},
+        _user_update(award_id, rewards, counters),
+        projection=USER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if user is not None:
+        user['level'] = apply_level(db, user)
+        _after_update(db, user, ['points', *(counters or {})], activities)
+    if buffer is not None:
+        buffer.mark_applied(rewards)
+    else:
+        db.rewards.update_many(
+            {'_id': {'$in': [reward['_id'] for reward in rewards]}},
+            {'$unset': {'pending': ''}, '$set': {'updated_at': datetime.utcnow()}}
+        )
+    for reward in rewards:
+        reward.pop('pending', None)
+    return user
+
+
+def _reward(user_id, points, source, description, metadata, earned_at, now):
+    return {
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'points': points,
+        'source': source,
+        'description': description,
+        'earned_at': earned_at or now,
+        'updated_at': now,
+        'metadata': metadata or {},
+        'pending': True
+    }
+
+
+def award_points(db, user_id, points, source, description, metadata=None,
+                 counters=None, idempotency_key=None, earned_at=None, activity=None):
+    """Record a point award and apply it to the user.
+
+    ``counters`` are activity counters to increment in the same write, for
+    example ``{'books_added': 1}``. ``activity`` ('reading' or
+    'productivity') counts the award's day towards that streak. Returns a dict with the ``reward``
+    document, the user's new ``points`` balance and ``level``, and whether
+    the award was a ``duplicate`` of an earlier call with the same
+    ``idempotency_key``.
+    """
+    reward = _reward(user_id, points, source, description, metadata, earned_at, datetime.utcnow())
+    reward['counters'] = counters or {}
+    if idempotency_key:
+        reward['idempotency_key'] = idempotency_key
+
+    buffer = None if idempotency_key else _buffer()
+    duplicate = False
+    if buffer is not None:
+        buffer.append([reward])
+    else:
+        try:
+            db.rewards.insert_one(reward)
+        except DuplicateKeyError:
+            # A retry: finish the original award if it is still pending
+            reward = db.rewards.find_one({'user_id': user_id, 'idempotency_key': idempotency_key})
+            duplicate = True
+            if not reward.get('pending'):
+                return {'reward': reward, 'points': None, 'level': None, 'duplicate': True}
+
+    activities = [(activity, reward['earned_at'].date())] if activity else None
+    user = _apply(db, user_id, reward['_id'], [reward], reward['counters'], buffer, activities)
+
+    return {
+        'reward': reward,
+        'points': user['points'] if user else None,
+        'level': user['level'] if user else None,
+        'duplicate': duplicate
+    }
+
+
+def award_points_many(db, user_id, awards, counters=None, activities=None):
+    """Record several awards for one user with one insert and one $inc.
+
+    ``awards`` are dicts with ``points``, ``source``, ``description`` and
+    optionally ``metadata`` and ``earned_at``. ``activities`` are
+    ``(kind, date)`` pairs to count towards streaks. The batch is applied under the
+    first entry's id; the others reference it with ``batch_id``. Returns the
+    inserted reward documents.
+    """
+    if not awards:
+        return []
+
+    now = datetime.utcnow()
+    rewards = [
+        _reward(user_id, award['points'], award['source'], award['description'],
+                award.get('metadata'), award.get('earned_at'), now)
+        for award in awards
+    ]
+
+    batch_id = rewards[0]['_id']
+    rewards[0]['counters'] = counters or {}
+    for reward in rewards[1:]:
+        reward['batch_id'] = batch_id
+
+    buffer = _buffer()
+    if buffer is not None:
+        buffer.append(rewards)
+    else:
+        db.rewards.insert_many(rewards, ordered=False)
+    _apply(db, user_id, batch_id, rewards, counters, buffer, activities)
+
+    return rewards
+
+
+def award_points_bulk(db, awards):
+    """Record keyed awards for many users with one insert and one bulk update.
+
+    For background jobs. ``awards`` are dicts with ``user_id``, ``points``,
+    ``source``, ``description`` and ``idempotency_key``, and optionally
+    ``metadata``, ``counters``, ``earned_at`` and ``activity``. Awards already
+    recorded under their key are only finished if still pending. Returns
+    the number of awards applied.
+    """
+    if not awards:
+        return 0
+
+    now = datetime.utcnow()
+    rewards = []
+    activities = {}
+    for award in awards:
+        reward = _reward(award['user_id'], award['points'], award['source'], award['description'],
+                         award.get('metadata'), award.get('earned_at'), now)
+        reward['counters'] = award.get('counters') or {}
+        reward['idempotency_key'] = award['idempotency_key']
+        rewards.append(reward)
+        if award.get('activity'):
+            activities.setdefault(reward['user_id'], []).append((award['activity'], reward['earned_at'].date()))
+
+    try:
+        db.rewards.insert_many(rewards, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        # Retries: swap in the original entries, keeping only unfinished ones
+        duplicates = {error['index'] for error in e.details['writeErrors']}
+        keys = [rewards[index]['idempotency_key'] for index in duplicates]
+        pending = {
+            (reward['user_id'], reward['idempotency_key']): reward
+            for reward in db.rewards.find({'idempotency_key': {'$in': keys}, 'pending': True})
+        }
+        rewards = [
+            pending.get((reward['user_id'], reward['idempotency_key'])) if index in duplicates else reward
+            for index, reward in enumerate(rewards)
+        ]
+        rewards = [reward for reward in rewards if reward is not None]
+
+    if not rewards:
+        return 0
+
+    db.users.bulk_write([
+        UpdateOne(
+            {'_id': reward['user_id'], 'applied_awards': {'$ne': reward['_id']}},
+            _user_update(reward['_id'], [reward], reward['counters'])
+        )
+        for reward in rewards
+    ], ordered=False)
+
+    # Levels, streaks and badges from the updated users
+    changed_keys = {}
+    for reward in rewards:
+        changed_keys.setdefault(reward['user_id'], {'points'}).update(reward['counters'])
+    for user in db.users.find({'_id': {'$in': list(changed_keys)}}, USER_PROJECTION):
+        user['level'] = apply_level(db, user)
+        _after_update(db, user, changed_keys[user['_id']], activities.get(user['_id']))
+
+    db.rewards.update_many(
+        {'_id': {'$in': [reward['_id'] for reward in rewards]}},
+        {'$unset': {'pending': ''}, '$set': {'updated_at': datetime.utcnow()}}
+    )
+    return len(rewards)
+
+
+def update_counters(db, user_id, counters, activities=None):
+    """Increment activity counters for a change that awards no points"""
+    if counters:
+        user = db.users.find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {f'stats.{counter}': amount for counter, amount in counters.items()}},
+            projection=USER_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    elif activities:
+        user = db.users.find_one({'_id': user_id}, USER_PROJECTION)
+    else:
+        return
+    if user is not None:
+        _after_update(db, user, counters or {}, activities)
+
+
+def reconcile_pending_awards(db, older_than=RECONCILE_AFTER):
+    """Re-apply awards whose second phase never completed. Returns the count."""
+    cutoff = datetime.utcnow() - older_than
+    reconciled = 0
+
+    heads = db.rewards.find({'pending': True, 'updated_at': {'$lt': cutoff}, 'batch_id': {'$exists': False}})
+    for head in heads:
+        rewards = [head] + list(db.rewards.find({'batch_id': head['_id']}))
+        _apply(db, head['user_id'], head['_id'], rewards, head.get('counters'))
+        reconciled += 1
+
+    return reconciled
@@ -0,0 +1,121 @@
+"""
+Reading pace and completion forecasts.
+
+For every book being read, a batch job (``python maintenance.py
+forecast-reading``) looks at its reading sessions over the last
+``FORECAST_WINDOW_DAYS`` days and stores a ``forecast`` on the book:
+
+- ``pages_per_day``: pages read in the window divided by the days since
+  the first session in it.
+- ``days_remaining`` and ``projected_finish_at``: the remaining pages at
+  that pace.
+- ``consistency``: the share of those days with at least one session
+  (0 to 1).
+
+Sessions for a chunk of books are loaded in one query and reduced with
+NumPy, so the cost per book is a few array operations, not a Python loop
+over its history. Requests only read the stored numbers.
+
+Writing a forecast stamps ``updated_at``, so delta sync delivers it. Books
+that stopped being read keep their last forecast until the next run
+clears it (``clear_stale_forecasts``); the API hides it meanwhile.
+"""
+
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import numpy as np
+
+FORECAST_WINDOW_DAYS = 30
+
+
+def compute_forecasts(book_index, days_ago, pages, remaining, window=FORECAST_WINDOW_DAYS):
+    """Forecast metrics for ``len(remaining)`` books at once.
+
+    ``book_index``, ``days_ago`` (whole days before now, 0 to ``window - 1``)
+    and ``pages`` describe one session each. ``remaining`` is each book's
+    unread page count. Returns arrays of pages per day, days remaining
+    (NaN without any pace), consistency and session count.
+    """
+    count = len(remaining)
+    book_index = np.asarray(book_index, dtype=np.int64)
+    days_ago = np.asarray(days_ago, dtype=np.int64)
+    pages = np.asarray(pages, dtype=np.float64)
+    remaining = np.asarray(remaining, dtype=np.float64)
+
+    sessions = np.bincount(book_index, minlength=count)
+    pages_read = np.bincount(book_index, weights=pages, minlength=count)
+
+    # Days from each book's first session in the window up to today
+    first_day = np.zeros(count, dtype=np.int64)
+    np.maximum.at(first_day, book_index, days_ago)
+    span = first_day + 1
+
+    # Distinct (book, day) pairs give the days with reading
+    active = np.unique(book_index * window + days_ago) // window
+    active_days = np.bincount(active, minlength=count)
+
+    pages_per_day = np.where(sessions > 0, pages_read / span, 0.0)
+    consistency = np.where(sessions > 0, active_days / span, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_remaining = np.where(pages_per_day > 0, np.ceil(remaining / pages_per_day), np.nan)
+
+    return pages_per_day, days_remaining, consistency, sessions
+
+
+def forecast_books(db, books, now=None, window=FORECAST_WINDOW_DAYS):
+    """Compute and store forecasts for a chunk of books. Returns the count.
+
+    ``books`` need ``_id``, ``user_id``, ``page_count`` and ``current_page``.
+    """
+    if not books:
+        return 0
+
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=window)
+    positions = {book['_id']: index for index, book in enumerate(books)}
+
+    sessions = list(db.reading_sessions.find(
+        {
+            'user_id': {'$in': list({book['user_id'] for book in books})},
+            'book_id': {'$in': list(positions)},
+            'date': {'$gte': since}
+        },
+        {'_id': 0, 'book_id': 1, 'date': 1, 'pages_read': 1}
+    ))
+
+    book_index = [positions[session['book_id']] for session in sessions]
+    days_ago = [min(window - 1, max(0, (now - session['date']).days)) for session in sessions]
+    pages = [session.get('pages_read', 0) for session in sessions]
+    remaining = [max(0, book.get('page_count', 0) - book.get('current_page', 0)) for book in books]
+
+    pages_per_day, days_remaining, consistency, counts = compute_forecasts(
+        book_index, days_ago, pages, remaining, window)
+
+    operations = []
+    for index, book in enumerate(books):
+        days_left = None if np.isnan(days_remaining[index]) else int(days_remaining[index])
+        operations.append(UpdateOne({'_id': book['_id']}, {'$set': {
+            'forecast': {
+                'pages_per_day': round(float(pages_per_day[index]), 2),
+                'days_remaining': days_left,
+                'projected_finish_at': now + timedelta(days=days_left) if days_left is not None else None,
+                'consistency': round(float(consistency[index]), 3),
+                'sessions': int(counts[index]),
+                'window_days': window,
+                'computed_at': now
+            },
+            'updated_at': now
+        }}))
+
+    db.books.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def clear_stale_forecasts(db, now=None):
+    """Remove forecasts from books no longer being read. Returns the count."""
+    now = now or datetime.utcnow()
+    result = db.books.update_many(
+        {'status': {'$ne': 'reading'}, 'forecast': {'$exists': True}},
+        {'$unset': {'forecast': ''}, '$set': {'updated_at': now}}
+    )
+    return result.modified_count
@@ -0,0 +1,139 @@
+"""
+Reading session coalescing.
+
+Clients autosave the current page every few seconds while the user reads.
+Instead of one ``reading_sessions`` document per save, saves for the same
+book that arrive within ``READING_SESSION_MERGE_MINUTES`` of the session's
+last activity are merged into it: ``pages_read`` and ``duration_minutes``
+are incremented, ``current_page`` and ``last_activity_at`` only move
+forward. ``date`` stays the time the session started.
+
+Sessions written before coalescing (or by clients that saved from an older
+build) are merged after the fact by ``python maintenance.py
+compact-sessions``. Sessions uploaded through offline sync keep their own
+documents: their ``client_event_id`` must survive for retries to dedupe.
+"""
+
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+
+from activity_buckets import bucket_day, replace_session_events
+from change_tracking import record_deletions
+
+
+def record_progress(db, user_id, book_id, pages_read, current_page, duration_minutes=0,
+                    notes='', window=timedelta(minutes=30), now=None):
+    """Add a progress update to the book's open session, or start one.
+
+    Returns the session after the update. Two updates racing past an
+    expired window may both start a session; compaction merges them later.
+    """
+    now = now or datetime.utcnow()
+    update = {
+        '$inc': {'pages_read': pages_read, 'duration_minutes': duration_minutes, 'updates': 1},
+        '$max': {'current_page': current_page, 'last_activity_at': now, 'updated_at': now},
+        '$setOnInsert': {'user_id': user_id, 'book_id': book_id, 'date': now}
+    }
+    if notes:
+        update['$set'] = {'notes': notes}
+    else:
+        update['$setOnInsert']['notes'] = ''
+
+    return db.reading_sessions.find_one_and_update(
+        {'user_id': user_id, 'book_id': book_id, 'last_activity_at': {'$gte': now - window}},
+        update,
+        sort=[('last_activity_at', -1)],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _merge_runs(sessions, window):
+    """Group one user's sessions (sorted by book and date) into merge runs"""
+    runs = []
+    for session in sessions:
+        previous = runs[-1][-1] if runs else None
+        if (previous is not None and previous['book_id'] == session['book_id']
+                and session['date'] - previous.get('last_activity_at', previous['date']) <= window):
+            runs[-1].append(session)
+        else:
+            runs.append([session])
+    return [run for run in runs if len(run) > 1]
+
+
+def compact_sessions(db, user_ids, window=timedelta(minutes=30), now=None):
+    """Merge micro-sessions for a chunk of users. Returns (runs merged, sessions removed).
+
+    Each run of sessions no more than ``window`` apart is folded into its
+    first session; the rest are deleted and tombstoned for delta sync, and
+    their day buckets follow. The first session records the ids it absorbed
+    until they are gone, so an interrupted run is not counted twice.
+    """
+    now = now or datetime.utcnow()
+    sessions = db.reading_sessions.find(
+        {
+            'user_id': {'$in': user_ids},
+            'client_event_id': {'$exists': False},
+            # Open sessions are still taking $inc updates; leave them be
+            '$nor': [{'last_activity_at': {'$gte': now - window}}]
+        },
+        {'user_id': 1, 'book_id': 1, 'date': 1, 'last_activity_at': 1, 'pages_read': 1,
+         'duration_minutes': 1, 'current_page': 1, 'notes': 1, 'updates': 1, 'merged_ids': 1}
+    ).sort([('user_id', 1), ('book_id', 1), ('date', 1)])
+
+    by_user = {}
+    for session in sessions:
+        by_user.setdefault(session['user_id'], []).append(session)
+
+    merges = []
+    for user_sessions in by_user.values():
+        for run in _merge_runs(user_sessions, window):
+            first = run[0]
+            # Sessions absorbed by an interrupted earlier run are already in its totals
+            counted = {session_id for session in run for session_id in session.get('merged_ids', ())}
+            uncounted = [session for session in run if session['_id'] not in counted]
+            notes = [session['notes'] for session in uncounted if session.get('notes')]
+            totals = {
+                'pages_read': sum(session.get('pages_read', 0) for session in uncounted),
+                'duration_minutes': sum(session.get('duration_minutes', 0) for session in uncounted),
+                'current_page': max(session.get('current_page', 0) for session in run),
+                'last_activity_at': max(session.get('last_activity_at', session['date']) for session in run),
+                'updates': sum(session.get('updates', 1) for session in uncounted),
+                'notes': '\n'.join(notes),
+                'merged_ids': [session['_id'] for session in run[1:]],
+                'updated_at': now
+            }
+            merges.append((dict(first, **totals), totals, run[1:]))
+
+    if not merges:
+        return 0, 0
+
+    # Totals land before the absorbed sessions are removed
+    db.reading_sessions.bulk_write([
+        UpdateOne({'_id': merged['_id']}, {'$set': totals}) for merged, totals, _ in merges
+    ], ordered=False)
+
+    removed = {}
+    for merged, _, absorbed in merges:
+        by_day = {}
+        for session in absorbed:
+            by_day.setdefault(bucket_day(session['date']), []).append(session['_id'])
+        first_day = bucket_day(merged['date'])
+        replace_session_events(db, merged['user_id'], first_day, by_day.pop(first_day, []), merged)
+        for day, session_ids in by_day.items():
+            replace_session_events(db, merged['user_id'], day, session_ids)
+        removed.setdefault(merged['user_id'], []).extend(merged['merged_ids'])
+
+    # Tombstones go first: a crash before the delete leaves the sessions
+    # for the next run to remove, never removed without a tombstone
+    for user_id, session_ids in removed.items():
+        record_deletions(db, user_id, 'reading_sessions', session_ids)
+    db.reading_sessions.delete_many({'_id': {'$in': [
+        session_id for session_ids in removed.values() for session_id in session_ids
+    ]}})
+    db.reading_sessions.update_many(
+        {'_id': {'$in': [merged['_id'] for merged, _, _ in merges]}},
+        {'$unset': {'merged_ids': ''}}
+    )
+
+    return len(merges), sum(len(session_ids) for session_ids in removed.values())
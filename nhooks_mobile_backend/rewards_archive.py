@@ -0,0 +1,155 @@
+"""
+Archival of old reward ledger entries.
+
+The ``rewards`` ledger only needs recent entries hot: balances, per-source
+totals and counters live on the user. ``python maintenance.py
+archive-rewards`` moves entries from months that ended more than
+``REWARDS_ARCHIVE_MONTHS`` ago into ``reward_archives``, one document per
+user per month:
+
+    {'user_id': ..., 'month': 2024-01-01, 'count': 212, 'points': 1840,
+     'points_by_source': {'nook': 900, ...}, 'count_by_source': {...},
+     'first_earned_at': ..., 'last_earned_at': ..., 'blob': <zlib'd BSON>}
+
+The summary answers counts without touching the blob; the blob holds the
+original documents, newest first, and is only inflated for the months a
+history page actually lands in. The live collection and its indexes then
+stay the size of the retention window however long users stay.
+
+Archived entries are not tombstoned: clients keep the copies they already
+synced, and ``GET /api/rewards/history`` pages into the archive after the
+live entries. Pending awards are never archived. An award's
+``idempotency_key`` stops guarding it once archived, so keep the window
+well past any retry horizon.
+"""
+
+from bson import Binary
+from datetime import datetime
+import bson
+import zlib
+
+# Shortest retention the archival job accepts
+ARCHIVE_MIN_MONTHS = 2
+
+ARCHIVE_COMPRESSION_LEVEL = 9
+
+
+def archive_cutoff(months, now=None):
+    """Start of the oldest month still kept live"""
+    now = now or datetime.utcnow()
+    month_index = now.year * 12 + now.month - 1 - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def encode_rows(rows):
+    return Binary(zlib.compress(bson.encode({'rows': rows}), ARCHIVE_COMPRESSION_LEVEL))
+
+
+def decode_rows(blob):
+    return bson.decode(zlib.decompress(blob))['rows']
+
+
+def _summary(user_id, month, rows, now):
+    points_by_source = {}
+    count_by_source = {}
+    for reward in rows:
+        source = reward.get('source', 'unknown')
+        points_by_source[source] = points_by_source.get(source, 0) + reward.get('points', 0)
+        count_by_source[source] = count_by_source.get(source, 0) + 1
+
+    return {
+        'user_id': user_id,
+        'month': month,
+        'count': len(rows),
+        'points': sum(points_by_source.values()),
+        'points_by_source': points_by_source,
+        'count_by_source': count_by_source,
+        'first_earned_at': rows[-1]['earned_at'],
+        'last_earned_at': rows[0]['earned_at'],
+        'blob': encode_rows(rows),
+        'archived_at': now
+    }
+
+
+def archive_rewards(db, user_ids, cutoff, now=None):
+    """Archive a chunk of users' entries earned before ``cutoff``.
+
+    Returns (entries archived, months written). Entries are merged into
+    any existing month by ``_id`` and deleted only once their month is
+    written, so an interrupted run is finished by the next one.
+    """
+    now = now or datetime.utcnow()
+    months = {}
+    for reward in db.rewards.find({
+        'user_id': {'$in': user_ids},
+        'earned_at': {'$lt': cutoff},
+        'pending': {'$ne': True}
+    }):
+        month = datetime(reward['earned_at'].year, reward['earned_at'].month, 1)
+        months.setdefault((reward['user_id'], month), []).append(reward)
+
+    archived = 0
+    for (user_id, month), rows in months.items():
+        existing = db.reward_archives.find_one({'user_id': user_id, 'month': month}, {'blob': 1})
+        if existing:
+            ids = {reward['_id'] for reward in rows}
+            rows += [reward for reward in decode_rows(existing['blob']) if reward['_id'] not in ids]
+        rows.sort(key=lambda reward: (reward['earned_at'], reward['_id']), reverse=True)
+
+        db.reward_archives.replace_one(
+            {'user_id': user_id, 'month': month},
+            _summary(user_id, month, rows, now),
+            upsert=True
+        )
+        archived += db.rewards.delete_many({'_id': {'$in': [reward['_id'] for reward in rows]}}).deleted_count
+
+    return archived, len(months)
+
+
+def _matching(archive, source, since):
+    """How many of a month's entries match, or None if its rows must be read"""
+    if since is not None and archive['first_earned_at'] < since:
+        return None
+    return archive['count_by_source'].get(source, 0) if source else archive['count']
+
+
+def _month_rows(db, archive_id, source, since):
+    blob = db.reward_archives.find_one({'_id': archive_id}, {'blob': 1})['blob']
+    return [
+        reward for reward in decode_rows(blob)
+        if (not source or reward.get('source') == source)
+        and (since is None or reward['earned_at'] >= since)
+    ]
+
+
+def archived_history(db, user_id, skip, limit, source=None, since=None):
+    """A page of archived entries, newest first, and how many match in total"""
+    query = {'user_id': user_id}
+    if since is not None:
+        query['last_earned_at'] = {'$gte': since}
+
+    rewards = []
+    total = 0
+    for archive in db.reward_archives.find(query, {'blob': 0}).sort('month', -1):
+        count = _matching(archive, source, since)
+        rows = None
+        if count is None:
+            rows = _month_rows(db, archive['_id'], source, since)
+            count = len(rows)
+
+        # Inflate only the months this page overlaps
+        start = max(0, skip - total)
+        end = skip + limit - total
+        if start < count and end > start:
+            if rows is None:
+                rows = _month_rows(db, archive['_id'], source, since)
+            rewards.extend(rows[start:end])
+        total += count
+
+    return rewards, total
+
+
+def iter_archived_rewards(db, user_id):
+    """Every archived entry of a user, oldest month first"""
+    for archive in db.reward_archives.find({'user_id': user_id}).sort('month', 1):
+        yield from reversed(decode_rows(archive['blob']))
@@ -0,0 +1,292 @@
+"""
+Write-behind buffer for the rewards ledger.
+
+When ``REWARDS_WRITE_BEHIND`` is enabled, reward entries are not inserted
+one by one. Each worker process appends them to a local append-only journal
+and keeps them in memory. A background thread flushes them to MongoDB with
+``insert_many`` once ``REWARDS_BUFFER_SIZE`` entries are waiting or the
+oldest has waited ``REWARDS_BUFFER_DELAY`` seconds. User balances are still
+updated immediately by ``points.award_points``; only the ledger insert is
+deferred.
+
+Crash safety: a flush switches to a new journal segment before writing, and
+deletes the old segment only after its entries are in MongoDB. Segments are
+named per process start and created exclusively, so a worker never appends
+to another's journal, even one that reused a crashed worker's pid. At app
+creation and whenever a worker starts buffering, segments that no live
+worker holds a lock on are replayed. Replayed entries
+are inserted with their original ``_id``, so a replay after a partial flush
+never duplicates rows. They are also marked pending, so
+``maintenance.py reconcile-awards`` applies any balance update the crash
+interrupted.
+
+Entries that are not flushed yet are visible to the worker that buffered
+them through ``pending_for``, which ``/api/rewards/history`` merges into its
+results.
+"""
+
+from bson import ObjectId, json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Fresh segment names tried before giving up on locking one
+SEGMENT_OPEN_ATTEMPTS = 5
+
+
+class RewardBuffer:
+    """Per-process write-behind buffer with a local journal"""
+
+    def __init__(self, db, journal_dir, max_entries=500, max_delay=1.0, fsync=True):
+        self.db = db
+        self.journal_dir = journal_dir
+        self.max_entries = max_entries
+        self.max_delay = max_delay
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._entries = []
+        self._sealed = []  # journal segments whose entries are not flushed yet
+        self._segment = 0
+        self._journal = None
+        self._pid = None
+        self._run_id = None
+
+        os.makedirs(journal_dir, exist_ok=True)
+
+    def _start(self):
+        """Open this process's journal and flush thread.
+
+        Done lazily on first use so that forked workers each get their own.
+        Journals of workers that died since the app was created (a preloading
+        master replays only once) are replayed first.
+        """
+        try:
+            replay_journals(self.db, self.journal_dir)
+        except Exception:
+            logger.exception('Failed to replay reward journals')
+
+        self._pid = os.getpid()
+        self._run_id = ObjectId()
+        self._entries = []
+        self._sealed = []
+        self._segment = 0
+        self._journal = None
+        self._open_segment()
+
+        thread = threading.Thread(target=self._run, name='reward-buffer-flush', daemon=True)
+        thread.start()
+        atexit.register(self.flush)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.journal_dir, f'rewards-{self._pid}-{self._run_id}-{segment:06d}.journal')
+
+    def _open_segment(self):
+        """Start a new journal segment, sealing the current one.
+
+        The segment is created and locked under a temporary name that replay
+        ignores, then renamed into place, so replay never sees it unlocked.
+        """
+        for _ in range(SEGMENT_OPEN_ATTEMPTS):
+            self._segment += 1
+            path = self._segment_path(self._segment)
+            journal = _create_segment(path + '.tmp')
+            if journal is not None:
+                break
+        else:
+            raise OSError(f'Could not create a reward journal segment in {self.journal_dir}')
+        os.rename(path + '.tmp', path)
+
+        if self._journal is not None:
+            self._sealed.append(self._journal)
+        self._journal = (journal, path)
+
+    def append(self, rewards):
+        """Journal reward entries and queue them for the next flush"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        lines = b''.join(
+            json_util.dumps(reward, json_options=CANONICAL_JSON_OPTIONS).encode('utf-8') + b'\n'
+            for reward in rewards
+        )
+
+        with self._lock:
+            journal = self._journal[0]
+            journal.write(lines)
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+
+            self._entries.extend(rewards)
+            full = len(self._entries) >= self.max_entries
+
+        if full:
+            self._wakeup.set()
+
+    def mark_applied(self, rewards):
+        """Journal that the balance update for these entries is done.
+
+        Not fsynced: if the marker is lost, replay leaves the entries pending
+        and reconciliation skips them via the user's applied_awards guard.
+        """
+        line = json_util.dumps({'applied': [reward['_id'] for reward in rewards]},
+                               json_options=CANONICAL_JSON_OPTIONS).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._journal is not None:
+                self._journal[0].write(line)
+                self._journal[0].flush()
+
+    def pending_for(self, user_id):
+        """Buffered entries for one user that are not in MongoDB yet"""
+        with self._lock:
+            return [reward for reward in self._entries if reward['user_id'] == user_id]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush buffered rewards, will retry')
+
+    def flush(self):
+        """Insert all buffered entries with one insert_many"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._entries or self._pid != os.getpid():
+                    return 0
+                entries = list(self._entries)
+                self._open_segment()
+                sealed = self._sealed
+                self._sealed = []
+
+            try:
+                _insert(self.db, entries, datetime.utcnow())
+            except Exception:
+                # Keep the segments on disk (and locked) until a later flush
+                # writes their entries
+                with self._lock:
+                    self._sealed[:0] = sealed
+                raise
+
+            # Entries stay visible to pending_for until they are in MongoDB
+            with self._lock:
+                del self._entries[:len(entries)]
+            for journal, path in sealed:
+                os.remove(path)
+                journal.close()
+            return len(entries)
+
+
+def _create_segment(path):
+    """Create and lock a new journal file, or None if the name is taken or
+    the file cannot be locked"""
+    try:
+        journal = open(path, 'xb')
+    except FileExistsError:
+        return None
+    try:
+        fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        journal.close()
+        os.remove(path)
+        return None
+    return journal
+
+
+def _insert(db, rewards, flushed_at):
+    """Insert ledger entries, ignoring ones a previous attempt already wrote"""
+    for reward in rewards:
+        # Stamp the flush time so delta sync sees entries written late
+        reward['updated_at'] = flushed_at
+
+    try:
+        db.rewards.insert_many(rewards, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+
+
+def replay_journals(db, journal_dir):
+    """Insert entries from journals left behind by crashed workers.
+
+    Journals still locked by a running worker are skipped. Returns the
+    number of entries replayed.
+    """
+    replayed = 0
+
+    for path in sorted(glob.glob(os.path.join(journal_dir, 'rewards-*.journal'))):
+        with open(path, 'rb') as journal:
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue  # owned by a live worker
+
+            rewards = []
+            applied = set()
+            for line in journal:
+                try:
+                    record = json_util.loads(line, json_options=CANONICAL_JSON_OPTIONS)
+                except ValueError:
+                    break  # torn final write from the crash
+                if 'applied' in record:
+                    applied.update(record['applied'])
+                else:
+                    rewards.append(record)
+
+            # Without a marker the balance update may not have happened
+            for reward in rewards:
+                if reward['_id'] in applied:
+                    reward.pop('pending', None)
+                else:
+                    reward['pending'] = True
+
+            if rewards:
+                _insert(db, rewards, datetime.utcnow())
+                replayed += len(rewards)
+
+        os.remove(path)
+        logger.info('Replayed %d buffered rewards from %s', len(rewards), path)
+
+    return replayed
+
+
+def init_app(app):
+    app.config.setdefault('REWARDS_WRITE_BEHIND', False)
+    app.config.setdefault('REWARDS_BUFFER_SIZE', 500)
+    app.config.setdefault('REWARDS_BUFFER_DELAY', 1.0)
+    app.config.setdefault('REWARDS_JOURNAL_FSYNC', True)
+    app.config.setdefault('REWARDS_JOURNAL_DIR', os.path.join(app.instance_path, 'rewards-journal'))
+
+    if not app.config['REWARDS_WRITE_BEHIND']:
+        return
+
+    db = app.mongo.db
+    try:
+        replay_journals(db, app.config['REWARDS_JOURNAL_DIR'])
+    except Exception:
+        # Journals stay on disk and are replayed by the next worker start
+        logger.exception('Failed to replay reward journals')
+    app.extensions['rewards_buffer'] = RewardBuffer(
+        db,
+        app.config['REWARDS_JOURNAL_DIR'],
+        max_entries=app.config['REWARDS_BUFFER_SIZE'],
+        max_delay=app.config['REWARDS_BUFFER_DELAY'],
+        fsync=app.config['REWARDS_JOURNAL_FSYNC']
+    )
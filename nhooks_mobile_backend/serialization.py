@@ -0,0 +1,162 @@
+"""
+Response serialization for the Nhooks API.
+
+Handlers can hand raw MongoDB documents straight to ``jsonify``: the JSON
+provider below encodes ObjectId, datetime and Decimal values natively, so
+there is no need to convert ids and timestamps field by field.
+
+Clients that send ``Accept: application/msgpack`` get the same ``jsonify``
+payloads encoded as MessagePack instead, and may send MessagePack request
+bodies, which ``request.get_json()`` decodes transparently.
+"""
+
+from flask import Request, has_request_context, request
+from flask.json.provider import JSONProvider
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, responses stay JSON only
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# MessagePack extension type codes. Datetimes use the standard timestamp
+# extension (-1), which every MessagePack client library understands.
+MSGPACK_EXT_OBJECTID = 1
+
+
+def encode_default(obj):
+    """Encode the BSON/stdlib types that JSON has no native form for"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        obj = obj.to_decimal()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj, indent=False):
+        """Serialize ``obj`` to UTF-8 encoded JSON"""
+        option = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=encode_default, option=option)
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj, indent=False):
+        """Serialize ``obj`` to UTF-8 encoded JSON"""
+        if indent:
+            return json.dumps(obj, default=encode_default, ensure_ascii=False, indent=2).encode('utf-8')
+        return json.dumps(obj, default=encode_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(s):
+        return json.loads(s)
+
+
+def msgpack_default(obj):
+    """Encode the types MessagePack has no native form for"""
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(MSGPACK_EXT_OBJECTID, obj.binary)
+    if isinstance(obj, datetime):
+        # Stored datetimes are naive UTC
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    return encode_default(obj)
+
+
+def msgpack_ext_hook(code, data):
+    if code == MSGPACK_EXT_OBJECTID:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def packb(obj):
+    """Serialize ``obj`` to MessagePack"""
+    return msgpack.packb(obj, default=msgpack_default, use_bin_type=True, datetime=False)
+
+
+def unpackb(data):
+    """Deserialize MessagePack, decoding timestamps to naive UTC datetimes"""
+    obj = msgpack.unpackb(data, ext_hook=msgpack_ext_hook, timestamp=3, raw=False, strict_map_key=False)
+    return _naive_datetimes(obj)
+
+
+def _naive_datetimes(obj):
+    if isinstance(obj, datetime):
+        return obj.replace(tzinfo=None)
+    if isinstance(obj, dict):
+        return {key: _naive_datetimes(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_naive_datetimes(value) for value in obj]
+    return obj
+
+
+def wants_msgpack():
+    """Whether the current request prefers a MessagePack response"""
+    if msgpack is None or not has_request_context():
+        return False
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+
+class ApiRequest(Request):
+    """Request class that also accepts MessagePack bodies in get_json()"""
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype != MSGPACK_MIMETYPE or msgpack is None:
+            return super().get_json(force=force, silent=silent, cache=cache)
+
+        try:
+            return unpackb(self.get_data(cache=cache))
+        except (ValueError, msgpack.UnpackException) as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+
+
+class MongoJSONProvider(JSONProvider):
+    """Flask JSON provider with native ObjectId, datetime and Decimal encoding"""
+
+    mimetype = JSON_MIMETYPE
+
+    # Pretty-print in debug mode, like Flask's default provider
+    compact = None
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if wants_msgpack():
+            response = self._app.response_class(packb(obj), mimetype=MSGPACK_MIMETYPE)
+        else:
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            response = self._app.response_class(dumps_bytes(obj, indent=indent), mimetype=self.mimetype)
+
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
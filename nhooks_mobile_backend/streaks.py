@@ -0,0 +1,59 @@
+"""
+Activity streaks, maintained incrementally.
+
+Each user's ``stats`` holds the current run of consecutive active days and
+the last active day (UTC, ``YYYY-MM-DD``) for reading and productivity.
+Recording an activity is a no-op if that day is already counted, so a
+write happens at most once per user, per streak, per day.
+"""
+
+from datetime import datetime, timedelta
+
+STREAKS = {
+    'reading': 'reading_streak',
+    'productivity': 'productivity_streak'
+}
+
+
+def record_activity(db, user, kind, day):
+    """Count ``day`` towards a user's ``kind`` streak.
+
+    ``user`` is a user document with ``stats``; it is updated in place.
+    Returns the streak counter name if it changed, otherwise None.
+    """
+    stats = user.setdefault('stats', {})
+    field = STREAKS[kind]
+    last_field = f'last_{kind}_day'
+
+    day_key = day.isoformat()
+    last_day = stats.get(last_field)
+    if last_day is not None and last_day >= day_key:
+        return None
+
+    if last_day == (day - timedelta(days=1)).isoformat():
+        streak = stats.get(field, 0) + 1
+    else:
+        streak = 1
+
+    # Compare-and-set on the last day, so concurrent requests count it once
+    result = db.users.update_one(
+        {'_id': user['_id'], f'stats.{last_field}': last_day},
+        {
+            '$set': {f'stats.{field}': streak, f'stats.{last_field}': day_key},
+            '$max': {f'stats.best_{field}': streak}
+        }
+    )
+    if not result.modified_count:
+        return None
+
+    stats[field] = streak
+    stats[last_field] = day_key
+    return field
+
+
+def current_streak(stats, kind, today=None):
+    """The streak as of today: it only counts if it includes today"""
+    today = today or datetime.utcnow().date()
+    if stats.get(f'last_{kind}_day') == today.isoformat():
+        return stats.get(STREAKS[kind], 0)
+    return 0
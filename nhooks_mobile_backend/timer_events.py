@@ -0,0 +1,253 @@
+"""
+Timer event fan-out and the active-timer cache.
+
+Timer endpoints publish a snapshot whenever a timer starts, pauses,
+resumes, completes or is cancelled. Each worker process keeps an
+in-process hub with one queue per open stream. A broker carries messages
+between workers:
+
+- ``LocalBroker`` delivers straight to this process's hub. It is the
+  stand-in for development and single-worker deployments.
+- ``RedisBroker`` publishes to a Redis channel that every worker listens
+  on. It is used when ``TIMER_EVENTS_REDIS_URL`` is set.
+
+The same messages keep each worker's ``ActiveTimerCache`` current, so
+``GET /api/hook/timers/active`` and the dashboard read timers from memory.
+Entries also expire after ``ACTIVE_TIMER_CACHE_TTL`` seconds, which bounds
+staleness when several workers run without Redis.
+
+Streams spend nearly all their time waiting on a queue. Serve them from an
+async worker (``gunicorn -k gevent``), where a waiting stream costs a
+greenlet rather than a thread.
+"""
+
+from flask import current_app
+from bson import ObjectId
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+from models import Timer
+from serialization import dumps_bytes, loads
+
+try:
+    import redis
+except ImportError:  # redis is only needed for multi-worker fan-out
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Messages a slow stream may fall behind by before older ones are dropped.
+# Each message is a full snapshot, so only the latest one matters.
+SUBSCRIBER_QUEUE_SIZE = 16
+
+# Users whose timer state each worker keeps in memory
+ACTIVE_TIMER_CACHE_SIZE = 100000
+
+
+class LocalBroker:
+    """Delivers messages to this process only"""
+
+    def start(self, dispatch):
+        self._dispatch = dispatch
+
+    def publish(self, message):
+        self._dispatch(message)
+
+
+class RedisBroker:
+    """Fans messages out to every worker through a Redis channel"""
+
+    def __init__(self, url, channel='nhooks:timer-events'):
+        if redis is None:
+            raise RuntimeError('TIMER_EVENTS_REDIS_URL is set but the redis package is not installed')
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+
+    def start(self, dispatch):
+        thread = threading.Thread(target=self._listen, args=(dispatch,), name='timer-events', daemon=True)
+        thread.start()
+
+    def _listen(self, dispatch):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    dispatch(loads(item['data']))
+            except Exception:
+                logger.exception('Timer event listener failed, reconnecting')
+                threading.Event().wait(1)
+
+    def publish(self, message):
+        self.client.publish(self.channel, dumps_bytes(message))
+
+
+class Subscription:
+    """One open stream's queue of timer messages"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message):
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """The next message, or None after ``timeout`` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ActiveTimerCache:
+    """Serialized active timer per user; None caches "no timer" too"""
+
+    def __init__(self, ttl, max_entries=ACTIVE_TIMER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (timer, stored_at, version)
+        self._version = 0
+
+    def get(self, user_id):
+        """(True, timer) on a hit, (False, version) on a miss.
+
+        Pass the version to ``fill`` after loading the timer.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return True, entry[0]
+            return False, entry[2] if entry is not None else None
+
+    def put(self, user_id, timer):
+        """Store a timer from a state change"""
+        with self._lock:
+            self._version += 1
+            self._store(user_id, timer, self._version)
+
+    def fill(self, user_id, timer, version):
+        """Store a timer loaded after a miss, unless a change landed meanwhile"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (entry[2] if entry is not None else None) == version:
+                self._store(user_id, timer, version)
+
+    def _store(self, user_id, timer, version):
+        self._entries[user_id] = (timer, time.monotonic(), version)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class TimerEventHub:
+    """In-process pub/sub of timer messages, keyed by user"""
+
+    def __init__(self, broker, cache):
+        self.broker = broker
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._pid = None
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker runs its own listener
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._subscriptions = {}
+                    self.broker.start(self.dispatch)
+                    self._pid = os.getpid()
+
+    def subscribe(self, user_id):
+        self._ensure_started()
+        subscription = Subscription(str(user_id))
+        with self._lock:
+            self._subscriptions.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def dispatch(self, message):
+        """Hand a message to this process's cache and streams for its user"""
+        self.cache.put(message['user_id'], message['timer'])
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(message['user_id'], ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def publish(self, user_id, event, timer):
+        """Publish a timer state change. ``timer`` is None once it is gone."""
+        self._ensure_started()
+        message = {
+            'user_id': str(user_id),
+            'event': event,
+            'timer': timer,
+            'server_time': datetime.utcnow().isoformat()
+        }
+        # Write through locally right away; other workers update on delivery
+        self.cache.put(message['user_id'], timer)
+        try:
+            self.broker.publish(message)
+        except Exception:
+            # Streams are an optimisation; clients still resync on reconnect
+            logger.exception('Failed to publish timer event')
+
+
+def publish_timer(user_id, event, timer_data=None):
+    """Publish a timer change from a request handler"""
+    timer = Timer(timer_data).to_dict() if timer_data else None
+    current_app.extensions['timer_events'].publish(user_id, event, timer)
+
+
+def cached_active_timer(user_id):
+    """The user's serialized active timer, from the cache when possible"""
+    cache = current_app.extensions['timer_events'].cache
+    user_id = str(user_id)
+    hit, value = cache.get(user_id)
+    if hit:
+        return value
+
+    timer_data = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(user_id)})
+    timer = Timer(timer_data).to_dict() if timer_data else None
+    cache.fill(user_id, timer, value)
+    return timer
+
+
+def format_event(message):
+    """A message as a Server-Sent Events frame"""
+    return b'event: timer\ndata: ' + dumps_bytes(message) + b'\n\n'
+
+
+def init_app(app):
+    app.config.setdefault('TIMER_EVENTS_REDIS_URL', None)
+    app.config.setdefault('TIMER_STREAM_HEARTBEAT', 15)
+    app.config.setdefault('TIMER_STREAM_MAX_SECONDS', 600)
+    app.config.setdefault('ACTIVE_TIMER_CACHE_TTL', 30)
+
+    if app.config['TIMER_EVENTS_REDIS_URL']:
+        broker = RedisBroker(app.config['TIMER_EVENTS_REDIS_URL'])
+    else:
+        broker = LocalBroker()
+    cache = ActiveTimerCache(app.config['ACTIVE_TIMER_CACHE_TTL'])
+    app.extensions['timer_events'] = TimerEventHub(broker, cache)
@@ -0,0 +1,219 @@
+"""
+Expiry of abandoned timers.
+
+Every active timer stores ``expected_end_at``: its start plus the planned
+duration, pushed back by each pause when the timer resumes. Timers whose
+expected end passed more than ``TIMER_EXPIRY_GRACE_MINUTES`` ago are
+considered abandoned. The sweep finds them through the ``expected_end_at``
+index, a batch at a time, and applies ``TIMER_EXPIRY_POLICY``:
+
+- ``complete`` records each timer as a completed task, ran until its
+  expected end (or until it was paused), and awards its points.
+- ``cancel`` just removes it.
+
+Only one process sweeps at a time: it must hold the ``timer-sweeper``
+lease in the ``leases`` collection, which it renews every interval and
+which another process takes over once it expires. Each batch is claimed by
+stamping a ``sweep_id``. The timer endpoints only act on active or paused
+timers, so a claimed timer cannot also be completed by its user. Timers
+left 'completing' by a completion request that died are recorded too. Tasks and
+rewards are keyed by timer id, so a batch interrupted by a crash is
+finished by the next sweep without recording anything twice.
+
+The sweep runs in a background thread when ``TIMER_SWEEPER_ENABLED`` is
+set, or as its own process with ``python maintenance.py sweep-timers --loop``.
+"""
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import logging
+import os
+import socket
+import threading
+
+from activity_buckets import add_tasks
+from points import award_points_bulk
+from timer_events import publish_timer
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+LEASE_NAME = 'timer-sweeper'
+
+EXPIRY_POLICIES = ('complete', 'cancel')
+
+# A completion request that has held its timer longer than this is taken
+# to have died: the next request or sweep finishes it
+COMPLETION_RETRY_AFTER = timedelta(minutes=1)
+
+
+def acquire_lease(db, name, owner, duration):
+    """Take or renew a named lease. Returns True while ``owner`` holds it."""
+    now = datetime.utcnow()
+    try:
+        lease = db.leases.find_one_and_update(
+            {'_id': name, '$or': [{'owner': owner}, {'expires_at': {'$lt': now}}]},
+            {'$set': {'owner': owner, 'expires_at': now + duration}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return False  # held by someone else: the upsert collided with it
+    return lease is not None
+
+
+def _completed_task(timer):
+    """The completed_tasks document for an expired timer"""
+    # paused_at is only set while paused; a paused timer stopped running then,
+    # and one whose completion request died stopped when it was claimed
+    end = timer.get('paused_at') or timer.get('completing_at') or timer['expected_end_at']
+    actual_duration = (end - timer['started_at']).total_seconds() - timer.get('total_paused_time', 0)
+    now = datetime.utcnow()
+    return {
+        # Keyed by the timer, so a retried sweep cannot record it twice
+        '_id': timer['_id'],
+        'user_id': timer['user_id'],
+        'task_name': timer['task_name'],
+        'planned_duration': timer['duration'],
+        'actual_duration': max(1, int(actual_duration / 60)),
+        'category': timer.get('category', 'general'),
+        'timer_type': timer.get('timer_type', 'work'),
+        'mood_rating': None,
+        'notes': '',
+        'completed_at': end,
+        'updated_at': now,
+        'started_at': timer['started_at'],
+        'expired': True,
+        'client_event_id': f'timer_expired:{timer["_id"]}'
+    }
+
+
+def _record_completions(db, timers):
+    """Insert completed tasks and award points for expired timers"""
+    tasks = [_completed_task(timer) for timer in timers]
+    try:
+        db.completed_tasks.insert_many(tasks, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+    add_tasks(db, tasks)
+
+    # Same rules as POST /api/hook/timers/complete, without a mood bonus
+    award_points_bulk(db, [
+        {
+            'user_id': task['user_id'],
+            'points': max(1, task['actual_duration'] // 5),
+            'source': 'hook',
+            'description': f'Completed {task["task_name"]} ({task["actual_duration"]} min)',
+            'metadata': {
+                'task_name': task['task_name'],
+                'duration': task['actual_duration'],
+                'category': task['category'],
+                'expired': True
+            },
+            'counters': {'tasks_completed': 1},
+            'idempotency_key': f'timer_completed:{timer["_id"]}',
+            'earned_at': task['completed_at'],
+            'activity': 'productivity'
+        }
+        for timer, task in zip(timers, tasks)
+    ])
+
+
+def sweep_expired_timers(db, policy='complete', grace=timedelta(hours=2), batch_size=500, now=None):
+    """Expire one batch of abandoned timers. Returns the number expired."""
+    if policy not in EXPIRY_POLICIES:
+        raise ValueError(f'Unknown timer expiry policy: {policy}')
+
+    cutoff = (now or datetime.utcnow()) - grace
+    candidates = [
+        timer['_id']
+        for timer in db.active_timers.find({'expected_end_at': {'$lt': cutoff}}, {'_id': 1})
+        .sort('expected_end_at', 1).limit(batch_size)
+    ]
+    if not candidates:
+        return 0
+
+    # Claim the batch; re-checking the expected end skips timers resumed
+    # since they were found, and completions still in progress are left be
+    sweep_id = ObjectId()
+    db.active_timers.update_many(
+        {
+            '_id': {'$in': candidates},
+            'expected_end_at': {'$lt': cutoff},
+            '$nor': [{'status': 'completing', 'completing_at': {'$gte': datetime.utcnow() - COMPLETION_RETRY_AFTER}}]
+        },
+        {'$set': {'status': 'expiring', 'sweep_id': sweep_id}}
+    )
+    timers = list(db.active_timers.find({'sweep_id': sweep_id}))
+
+    if policy == 'complete' and timers:
+        _record_completions(db, timers)
+
+    db.active_timers.delete_many({'sweep_id': sweep_id})
+    for timer in timers:
+        publish_timer(timer['user_id'], 'expired')
+
+    return len(timers)
+
+
+class TimerSweeper:
+    """Background thread that sweeps expired timers while holding the lease"""
+
+    def __init__(self, app):
+        self.app = app
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{ObjectId()}'
+        self.interval = app.config['TIMER_SWEEP_INTERVAL']
+        self._stop = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='timer-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Sweep until caught up, if this process holds the lease"""
+        config = self.app.config
+        db = self.app.mongo.db
+        lease = timedelta(seconds=self.interval * 2)
+        if not acquire_lease(db, LEASE_NAME, self.owner, lease):
+            return 0
+
+        grace = timedelta(minutes=config['TIMER_EXPIRY_GRACE_MINUTES'])
+        expired = 0
+        while not self._stop.is_set():
+            count = sweep_expired_timers(db, config['TIMER_EXPIRY_POLICY'], grace, config['TIMER_SWEEP_BATCH_SIZE'])
+            expired += count
+            # Renew between batches so a long backlog keeps the lease
+            if count < config['TIMER_SWEEP_BATCH_SIZE'] or not acquire_lease(db, LEASE_NAME, self.owner, lease):
+                break
+        return expired
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    expired = self.run_once()
+                if expired:
+                    logger.info('Expired %d abandoned timers', expired)
+            except Exception:
+                logger.exception('Timer sweep failed, will retry')
+            self._stop.wait(self.interval)
+
+
+def init_app(app):
+    app.config.setdefault('TIMER_SWEEPER_ENABLED', False)
+    app.config.setdefault('TIMER_EXPIRY_POLICY', 'complete')
+    app.config.setdefault('TIMER_EXPIRY_GRACE_MINUTES', 120)
+    app.config.setdefault('TIMER_SWEEP_INTERVAL', 60)
+    app.config.setdefault('TIMER_SWEEP_BATCH_SIZE', 500)
+
+    if app.config['TIMER_SWEEPER_ENABLED']:
+        app.extensions['timer_sweeper'] = TimerSweeper(app)
+        app.extensions['timer_sweeper'].start()